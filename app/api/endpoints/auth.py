@@ -1,12 +1,22 @@
+import hashlib
+import hmac
+import threading
+import time
+from typing import Optional
+from cachetools import TTLCache
 from fastapi import APIRouter, Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import exists, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, make_transient_to_detached
+from starlette.concurrency import run_in_threadpool
 from app.db.session import get_db
 from app.models.user import User
 from app.schemas.user import UserCreate, UserOut
 from app.core.security import (
     hash_password, verify_password, create_access_token, create_refresh_token,
-    decode_access_token, decode_refresh_token, is_token_expired
+    decode_access_token_claims, decode_refresh_token
 )
 from pydantic import BaseModel
 
@@ -14,6 +24,18 @@ from pydantic import BaseModel
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
+# Validated access tokens -> (subject, exp). Invalid tokens are never cached.
+_token_cache = TTLCache(maxsize=10000, ttl=30)
+_token_cache_lock = threading.Lock()
+
+# Dialect inserts supporting ON CONFLICT DO NOTHING; others fall back to an EXISTS check
+UPSERT_INSERTS = {"postgresql": pg_insert, "sqlite": sqlite_insert}
+
+# Active users by id, held as detached snapshots and merged into the
+# request session without a SELECT. Invalidated on login/refresh/logout.
+_user_auth_cache = TTLCache(maxsize=5000, ttl=60)
+_user_auth_cache_lock = threading.Lock()
+
 
 class TokenRefreshRequest(BaseModel):
     refresh_token: str
@@ -25,26 +47,81 @@ class TokenResponse(BaseModel):
     token_type: str = "bearer"
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    subject = decode_access_token(token)
+def _token_cache_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()[:32]
+
+
+def _cached_token_subject(key: str) -> Optional[str]:
+    with _token_cache_lock:
+        cached = _token_cache.get(key)
+    if cached and cached[1] > time.time():
+        return cached[0]
+    return None
+
+
+def _verify_and_cache_token(token: str, key: str) -> Optional[str]:
+    claims = decode_access_token_claims(token)
+    if not claims:
+        return None
+    with _token_cache_lock:
+        _token_cache[key] = claims
+    return claims[0]
+
+
+def _cache_user(user: User) -> None:
+    snapshot = User(**{c.key: getattr(user, c.key) for c in User.__table__.columns})
+    make_transient_to_detached(snapshot)
+    with _user_auth_cache_lock:
+        _user_auth_cache[user.id] = snapshot
+
+
+def invalidate_user_cache(user_id: int) -> None:
+    with _user_auth_cache_lock:
+        _user_auth_cache.pop(user_id, None)
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+    # Cache hits resolve on the event loop; only cold verifications use a worker thread
+    key = _token_cache_key(token)
+    subject = _cached_token_subject(key)
+    if subject is None:
+        subject = await run_in_threadpool(_verify_and_cache_token, token, key)
     if not subject:
         raise HTTPException(status_code=401, detail="Invalid token")
-    user = db.query(User).get(int(subject))
+    user_id = int(subject)
+    with _user_auth_cache_lock:
+        cached = _user_auth_cache.get(user_id)
+    if cached is not None:
+        return db.merge(cached, load=False)
+
+    user = await run_in_threadpool(db.get, User, user_id)
     if not user or not user.is_active:
         raise HTTPException(status_code=401, detail="Inactive or missing user")
+    _cache_user(user)
     return user
 
 
 @router.post("/register", response_model=UserOut)
 def register(user_in: UserCreate, db: Session = Depends(get_db)):
-    existing = db.query(User).filter(User.email == user_in.email).first()
-    if existing:
+    values = dict(email=user_in.email, full_name=user_in.full_name, password_hash=hash_password(user_in.password))
+    insert = UPSERT_INSERTS.get(db.get_bind().dialect.name)
+    if insert is not None:
+        # Let the unique index on users.email detect duplicates in the same round trip
+        stmt = insert(User).values(**values).on_conflict_do_nothing(index_elements=[User.email]).returning(User)
+        user = db.execute(stmt).scalar_one_or_none()
+    elif db.scalar(select(exists().where(User.email == user_in.email))):
+        user = None
+    else:
+        user = User(**values)
+        db.add(user)
+        db.flush()
+    if user is None:
+        db.rollback()
         raise HTTPException(status_code=400, detail="Email already registered")
-    user = User(email=user_in.email, full_name=user_in.full_name, password_hash=hash_password(user_in.password))
-    db.add(user)
+    # RETURNING populated every column; serialize before commit expires them
+    user_out = UserOut.model_validate(user)
     db.commit()
-    db.refresh(user)
-    return user
+    return user_out
 
 
 @router.post("/login", response_model=TokenResponse)
@@ -60,6 +137,7 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     # Store refresh token in database
     user.refresh_token = refresh_token
     db.commit()
+    invalidate_user_cache(user.id)
     
     return {
         "access_token": access_token,
@@ -70,23 +148,16 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
 
 @router.post("/refresh", response_model=TokenResponse)
 def refresh_token(request: TokenRefreshRequest, db: Session = Depends(get_db)):
-    # Decode refresh token
+    # Decode refresh token; expired tokens are rejected here since decoding verifies exp
     user_id = decode_refresh_token(request.refresh_token)
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid refresh token")
     
     # Get user and verify refresh token matches
-    user = db.query(User).filter(User.id == int(user_id)).first()
-    if not user or user.refresh_token != request.refresh_token:
+    user = db.get(User, int(user_id))
+    if not user or not user.refresh_token or not hmac.compare_digest(user.refresh_token, request.refresh_token):
         raise HTTPException(status_code=401, detail="Invalid refresh token")
     
-    # Check if refresh token is expired
-    if is_token_expired(request.refresh_token):
-        # Clear refresh token from database
-        user.refresh_token = None
-        db.commit()
-        raise HTTPException(status_code=401, detail="Refresh token expired")
-    
     # Create new tokens
     new_access_token = create_access_token(subject=str(user.id))
     new_refresh_token = create_refresh_token(subject=str(user.id))
@@ -94,6 +165,7 @@ def refresh_token(request: TokenRefreshRequest, db: Session = Depends(get_db)):
     # Update refresh token in database
     user.refresh_token = new_refresh_token
     db.commit()
+    invalidate_user_cache(user.id)
     
     return {
         "access_token": new_access_token,
@@ -107,6 +179,7 @@ def logout(current_user: User = Depends(get_current_user), db: Session = Depends
     # Clear refresh token from database
     current_user.refresh_token = None
     db.commit()
+    invalidate_user_cache(current_user.id)
     return {"message": "Successfully logged out"}
 
 
@@ -1,29 +1,56 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy import update
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Union
+import logging
 import os
+import threading
 from app.db.session import get_db
 from app.schemas.order import EmailConfig, PrinterConfig
 from app.models.order import EmailConfig as EmailConfigModel
 from app.models.order import PrinterConfig as PrinterConfigModel
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter, field_validator
 from app.core.config import settings
 from app.api.endpoints.auth import get_current_user
 from app.models.user import User
+from app.services.scheduler import email_scheduler
+from app.services.email_processor import probe_imap_login
+from app.services.file_downloader import file_downloader
 import imaplib
+from cachetools import TTLCache
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Serialized GET /email and GET /printers responses. Cleared by the PUT
+# handlers; the TTL lets other workers pick up changes on their own.
+_config_cache = TTLCache(maxsize=2, ttl=30)
+_config_cache_lock = threading.Lock()
+
+PRINTER_LIST_ADAPTER = TypeAdapter(List[PrinterConfig])
+
+def _invalidate_config_cache():
+    with _config_cache_lock:
+        _config_cache.clear()
 
 class EmailConfigUpdate(BaseModel):
     email_address: str
     email_password: str
     imap_server: str = "imap.gmail.com"
-    allowed_senders: str
+    allowed_senders: Union[str, List[str]]
     max_age_days: int = 10
     sleep_time: int = 5
     auto_download_enabled: bool = False
     download_path: Optional[str] = None
 
+    @field_validator("allowed_senders", mode="after")
+    @classmethod
+    def normalize_allowed_senders(cls, value: Union[str, List[str]]) -> str:
+        """Normalize once on write so readers can simply split on commas"""
+        senders = value.split(",") if isinstance(value, str) else value
+        normalized = dict.fromkeys(s.strip().lower() for s in senders if s.strip())
+        return ",".join(normalized)
+
 class EmailConfigResponse(BaseModel):
     email_address: str
     imap_server: str
@@ -45,9 +72,14 @@ class EmailValidationResponse(BaseModel):
 @router.get("/email", response_model=EmailConfigResponse)
 def get_email_config(db: Session = Depends(get_db), _: User = Depends(get_current_user)):
     """Get current email configuration"""
+    with _config_cache_lock:
+        cached = _config_cache.get("email")
+    if cached is not None:
+        return cached
+
     config = db.query(EmailConfigModel).first()
     if not config:
-        return {
+        response = {
             "email_address": "",
             "imap_server": "imap.gmail.com",
             "allowed_senders": "",
@@ -56,21 +88,23 @@ def get_email_config(db: Session = Depends(get_db), _: User = Depends(get_curren
             "auto_download_enabled": False,
             "download_path": None
         }
-    return {
-        "email_address": config.email_address,
-        "imap_server": config.imap_server,
-        "allowed_senders": config.allowed_senders,
-        "max_age_days": config.max_age_days,
-        "sleep_time": config.sleep_time,
-        "auto_download_enabled": config.auto_download_enabled or False,
-        "download_path": config.download_path
-    }
+    else:
+        response = {
+            "email_address": config.email_address,
+            "imap_server": config.imap_server,
+            "allowed_senders": config.allowed_senders,
+            "max_age_days": config.max_age_days,
+            "sleep_time": config.sleep_time,
+            "auto_download_enabled": config.auto_download_enabled or False,
+            "download_path": config.download_path
+        }
+    with _config_cache_lock:
+        _config_cache["email"] = response
+    return response
 
 @router.put("/email")
 def update_email_config(config: EmailConfigUpdate, db: Session = Depends(get_db), _: User = Depends(get_current_user)):
     """Update email configuration"""
-    from app.services.scheduler import email_scheduler
-    
     db_config = db.query(EmailConfigModel).first()
     old_sleep_time = db_config.sleep_time if db_config else 5
     old_download_path = db_config.download_path if db_config else None
@@ -100,6 +134,8 @@ def update_email_config(config: EmailConfigUpdate, db: Session = Depends(get_db)
         db_config.download_path = config.download_path
     
     db.commit()
+    _invalidate_config_cache()
+    file_downloader.invalidate_config()
     
     # Update scheduler interval if it changed and scheduler is running
     if email_scheduler.is_running and old_sleep_time != config.sleep_time:
@@ -109,10 +145,10 @@ def update_email_config(config: EmailConfigUpdate, db: Session = Depends(get_db)
     if (old_download_path != config.download_path and 
         config.download_path and 
         os.path.exists('/.dockerenv')):
-        print(f"⚠️ Download path changed from '{old_download_path}' to '{config.download_path}'")
-        print("⚠️ Please restart Docker containers to apply the new download path")
-        print("⚠️ Run: python auto_update_path.py")
-        print("⚠️ Or run: docker-compose down && docker-compose up -d")
+        logger.warning("⚠️ Download path changed from '%s' to '%s'", old_download_path, config.download_path)
+        logger.warning("⚠️ Please restart Docker containers to apply the new download path")
+        logger.warning("⚠️ Run: python auto_update_path.py")
+        logger.warning("⚠️ Or run: docker-compose down && docker-compose up -d")
     
     return {"status": "Email configuration updated successfully"}
 
@@ -120,18 +156,8 @@ def update_email_config(config: EmailConfigUpdate, db: Session = Depends(get_db)
 def validate_email_credentials(validation: EmailValidationRequest, _: User = Depends(get_current_user)):
     """Validate email credentials before saving"""
     try:
-        # Connect to IMAP server
-        mail = imaplib.IMAP4_SSL(validation.imap_server)
-        
-        # Try to login with provided credentials
-        mail.login(validation.email_address, validation.email_password)
-        
-        # Test accessing inbox
-        mail.select('INBOX')
-        
-        # Close connection
-        mail.close()
-        mail.logout()
+        # Log in and select the inbox, or NOOP an already validated session
+        probe_imap_login(validation.imap_server, validation.email_address, validation.email_password)
         
         return {
             "valid": True,
@@ -158,7 +184,14 @@ def validate_email_credentials(validation: EmailValidationRequest, _: User = Dep
 
 @router.get("/printers", response_model=List[PrinterConfig])
 def get_printer_configs(db: Session = Depends(get_db), _: User = Depends(get_current_user)):
-    return db.query(PrinterConfigModel).all()
+    with _config_cache_lock:
+        body = _config_cache.get("printers")
+    if body is None:
+        printers = PRINTER_LIST_ADAPTER.validate_python(db.query(PrinterConfigModel).all(), from_attributes=True)
+        body = PRINTER_LIST_ADAPTER.dump_json(printers)
+        with _config_cache_lock:
+            _config_cache["printers"] = body
+    return Response(content=body, media_type="application/json")
 
 @router.put("/printers/{printer_id}", response_model=PrinterConfig)
 def update_printer_config(
@@ -167,13 +200,19 @@ def update_printer_config(
     db: Session = Depends(get_db),
     _: User = Depends(get_current_user)
 ):
-    db_config = db.query(PrinterConfigModel).filter(PrinterConfigModel.id == printer_id).first()
-    if not db_config:
+    # Single UPDATE ... RETURNING of the fields the client sent; the path id is authoritative
+    stmt = (
+        update(PrinterConfigModel)
+        .where(PrinterConfigModel.id == printer_id)
+        .values(**config.model_dump(exclude_unset=True, exclude={"id"}))
+        .returning(PrinterConfigModel)
+        .execution_options(synchronize_session=False)
+    )
+    db_config = db.execute(stmt).scalar_one_or_none()
+    if db_config is None:
         raise HTTPException(status_code=404, detail="Printer configuration not found")
     
-    for key, value in config.dict().items():
-        setattr(db_config, key, value)
-    
+    updated_config = PrinterConfig.model_validate(db_config)
     db.commit()
-    db.refresh(db_config)
-    return db_config
\ No newline at end of file
+    _invalidate_config_cache()
+    return updated_config
\ No newline at end of file
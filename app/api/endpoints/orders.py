@@ -1,41 +1,162 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session, load_only, raiseload, selectinload
+from pydantic_core import to_json
+from typing import List, Optional, Tuple
+import asyncio
+import base64
+import hashlib
+import imaplib
+import logging
 import os
+import re
+import time
+from datetime import datetime
+from urllib.parse import quote
+from app.core.config import settings
 from app.db.session import get_db
-from app.schemas.order import Order, OrderCreate
-from app.services.email_processor import EmailProcessor
+from app.schemas.order import Order, OrderCreate, OrderListItem
+from app.services.email_processor import EmailProcessor, probe_imap_login
 from app.services.scheduler import email_scheduler
+from app.services.printer_service import printer_service
 from app.models.order import Order as OrderModel, Attachment, PrintJob, ProcessingLog
 from app.websocket_manager import manager
 from app.api.endpoints.auth import get_current_user
 from app.models.user import User
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
-@router.get("/", response_model=List[Order])
+# Only the columns serialized by the Order response schema
+ORDER_RESPONSE_COLUMNS = load_only(
+    OrderModel.id,
+    OrderModel.po_number,
+    OrderModel.order_type,
+    OrderModel.customer_name,
+    OrderModel.delivery_address,
+    OrderModel.committed_shipping_date,
+    OrderModel.processed_time,
+    OrderModel.status,
+    OrderModel.folder_path
+)
+
+# Columns selected for the OrderListItem rows returned by get_orders
+ORDER_LIST_COLUMNS = (
+    OrderModel.id,
+    OrderModel.po_number,
+    OrderModel.order_type,
+    OrderModel.customer_name,
+    OrderModel.committed_shipping_date,
+    OrderModel.processed_time,
+    OrderModel.status
+)
+
+# Batch-load the collections serialized by the Order response schema; any
+# other relationship access while serializing raises instead of lazy loading
+ORDER_RESPONSE_RELATIONSHIPS = (
+    selectinload(OrderModel.attachments).raiseload("*"),
+    selectinload(OrderModel.processing_logs).raiseload("*"),
+    raiseload("*")
+)
+
+# MIME types for attachment downloads, keyed by lowercase file extension
+MEDIA_TYPES = {
+    'pdf': 'application/pdf',
+    'png': 'image/png',
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'gif': 'image/gif',
+    'bmp': 'image/bmp',
+    'txt': 'text/plain',
+    'html': 'text/html'
+}
+MEDIA_EXTENSION_RE = re.compile(r"\.(pdf|png|jpe?g|gif|bmp|txt|html)$", re.IGNORECASE)
+
+# Last /processing-status payload, reused for STATUS_CACHE_TTL seconds so
+# dashboards polling at once share one scheduler lookup. Reset on start/stop;
+# clients also get pushed status_update messages over the WebSocket.
+STATUS_CACHE_TTL = 0.5
+_status_cache = {"time": 0.0, "value": None}
+
+# Maximum number of attachments submitted to the printer at once per order
+PRINT_CONCURRENCY = 4
+
+class LargeChunkFileResponse(FileResponse):
+    """FileResponse that reads in 1 MiB chunks instead of Starlette's 64 KiB"""
+    chunk_size = 1024 * 1024
+
+def _accel_redirect_path(file_path: str):
+    """Map a file under ATTACHMENT_ACCEL_ROOT to its internal nginx location, if enabled"""
+    if not settings.ATTACHMENT_ACCEL_ROOT:
+        return None
+    root = os.path.realpath(settings.ATTACHMENT_ACCEL_ROOT)
+    real_path = os.path.realpath(file_path)
+    if os.path.commonpath([root, real_path]) != root:
+        return None
+    rel_path = os.path.relpath(real_path, root).replace(os.sep, '/')
+    return settings.ATTACHMENT_ACCEL_LOCATION.rstrip('/') + '/' + quote(rel_path)
+
+def _conditional_json_response(request: Request, content: bytes, headers: Optional[dict] = None) -> Response:
+    """Return content with an ETag, or a bodiless 304 if the client already has it"""
+    etag = f'"{hashlib.sha1(content).hexdigest()}"'
+    headers = {**(headers or {}), "ETag": etag, "Cache-Control": "private, max-age=1"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=content, media_type="application/json", headers=headers)
+
+def _encode_order_cursor(processed_time: datetime, order_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{processed_time.isoformat()}|{order_id}".encode()).decode()
+
+def _decode_order_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        processed_time, order_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(processed_time), int(order_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/", response_model=List[OrderListItem])
 def get_orders(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
     search: str = None,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     _: User = Depends(get_current_user)
 ):
-    """Get all processed orders with optional PO number search"""
-    query = db.query(OrderModel)
+    """Get all processed orders with optional PO number search.
+
+    Pass the X-Next-Cursor header of a page as ``cursor`` to fetch the next
+    page with an index seek instead of skipping rows with OFFSET.
+    """
+    query = db.query(*ORDER_LIST_COLUMNS)
     
     # Add search filter if provided
     if search:
         query = query.filter(OrderModel.po_number.ilike(f"%{search}%"))
     
-    orders = query.order_by(OrderModel.processed_time.desc()).offset(skip).limit(limit).all()
-    return orders
+    query = query.order_by(OrderModel.processed_time.desc(), OrderModel.id.desc())
+    if cursor:
+        query = query.filter(tuple_(OrderModel.processed_time, OrderModel.id) < tuple_(*_decode_order_cursor(cursor)))
+    elif skip:
+        query = query.offset(skip)
+    rows = query.limit(limit).all()
+    
+    headers = {}
+    if len(rows) == limit and rows and rows[-1].processed_time is not None:
+        headers["X-Next-Cursor"] = _encode_order_cursor(rows[-1].processed_time, rows[-1].id)
+    
+    # Rows already match OrderListItem column-for-column; encode them directly
+    return _conditional_json_response(request, to_json([row._asdict() for row in rows]), headers)
 
 @router.get("/latest", response_model=Order)
 def get_latest_order(db: Session = Depends(get_db), _: User = Depends(get_current_user)):
     """Get the most recently processed order"""
-    order = db.query(OrderModel).order_by(OrderModel.processed_time.desc()).first()
+    order = db.query(OrderModel).options(ORDER_RESPONSE_COLUMNS, *ORDER_RESPONSE_RELATIONSHIPS).order_by(OrderModel.processed_time.desc(), OrderModel.id.desc()).limit(1).first()
     if not order:
         raise HTTPException(status_code=404, detail="No orders found")
     return order
@@ -43,25 +164,32 @@ def get_latest_order(db: Session = Depends(get_db), _: User = Depends(get_curren
 @router.get("/processing-status")
 async def get_processing_status():
     """Get the current status of email processing"""
+    now = time.monotonic()
+    if _status_cache["value"] is not None and now - _status_cache["time"] < STATUS_CACHE_TTL:
+        return _status_cache["value"]
+    
     status = email_scheduler.get_status()
-    return {
+    _status_cache["value"] = {
         "status": "running" if status["is_running"] else "stopped",
         "is_processing": status["is_running"],
         "scheduler_running": status["scheduler_running"],
         "jobs": status["jobs"]
     }
+    _status_cache["time"] = now
+    return _status_cache["value"]
 
 @router.get("/{order_id}", response_model=Order)
 def get_order(
     order_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     _: User = Depends(get_current_user)
 ):
     """Get a specific order by ID"""
-    order = db.query(OrderModel).filter(OrderModel.id == order_id).first()
+    order = db.get(OrderModel, order_id, options=ORDER_RESPONSE_RELATIONSHIPS)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
-    return order
+    return _conditional_json_response(request, Order.model_validate(order).model_dump_json().encode())
 
 @router.delete("/{order_id}")
 def delete_order(
@@ -70,32 +198,32 @@ def delete_order(
     _: User = Depends(get_current_user)
 ):
     """Delete a specific order by ID"""
-    order = db.query(OrderModel).filter(OrderModel.id == order_id).first()
+    order = db.get(OrderModel, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
     try:
-        # Delete associated records first (attachments, print jobs, processing logs)
-        db.query(Attachment).filter(Attachment.order_id == order_id).delete()
-        db.query(PrintJob).filter(PrintJob.order_id == order_id).delete()
-        db.query(ProcessingLog).filter(ProcessingLog.order_id == order_id).delete()
-        
-        # Delete the order
+        # Attachments, print jobs and processing logs are removed by ON DELETE CASCADE.
+        # Only the Postgres migration adds it to existing tables, so delete them
+        # explicitly elsewhere (SQLite databases created before it)
+        if db.get_bind().dialect.name != "postgresql":
+            for model in (Attachment, PrintJob, ProcessingLog):
+                db.query(model).filter(model.order_id == order_id).delete(synchronize_session=False)
         db.delete(order)
         db.commit()
         
-        print(f"🗑️ Order {order.po_number} (ID: {order_id}) deleted successfully")
+        logger.info("🗑️ Order %s (ID: %s) deleted successfully", order.po_number, order_id)
         return {"message": f"Order {order.po_number} deleted successfully"}
         
     except Exception as e:
         db.rollback()
-        print(f"❌ Error deleting order {order_id}: {str(e)}")
+        logger.error("❌ Error deleting order %s: %s", order_id, e)
         raise HTTPException(status_code=500, detail=f"Error deleting order: {str(e)}")
 
 @router.get("/attachments/{attachment_id}")
 def get_attachment_info(attachment_id: int, db: Session = Depends(get_db), _: User = Depends(get_current_user)):
     """Get attachment information"""
-    attachment = db.query(Attachment).filter(Attachment.id == attachment_id).first()
+    attachment = db.get(Attachment, attachment_id)
     if not attachment:
         raise HTTPException(status_code=404, detail="Attachment not found")
     
@@ -107,7 +235,7 @@ def get_attachment_info(attachment_id: int, db: Session = Depends(get_db), _: Us
         "sheet_type": attachment.sheet_type,
         "sheet_number": attachment.sheet_number,
         "print_status": attachment.print_status,
-        "file_exists": os.path.exists(attachment.file_path) if attachment.file_path else False
+        "file_exists": os.path.isfile(attachment.file_path) if attachment.file_path else False
     }
 
 @router.get("/attachments/{attachment_id}/download")
@@ -118,7 +246,7 @@ def download_attachment(
     _: User = Depends(get_current_user)
 ):
     """Download an attachment file. Use format=original to get original file."""
-    attachment = db.query(Attachment).filter(Attachment.id == attachment_id).first()
+    attachment = db.get(Attachment, attachment_id)
     if not attachment:
         raise HTTPException(status_code=404, detail="Attachment not found")
     
@@ -130,29 +258,31 @@ def download_attachment(
         file_path = attachment.file_path
         file_name = attachment.file_name
     
-    if not os.path.exists(file_path):
+    # One stat call serves as the existence check and is handed to FileResponse
+    try:
+        stat_result = os.stat(file_path)
+    except OSError:
         raise HTTPException(status_code=404, detail="File not found on server")
     
     # Get file extension for proper MIME type
-    file_extension = os.path.splitext(file_path)[1].lower()
-    media_types = {
-        '.pdf': 'application/pdf',
-        '.png': 'image/png',
-        '.jpg': 'image/jpeg',
-        '.jpeg': 'image/jpeg',
-        '.gif': 'image/gif',
-        '.bmp': 'image/bmp',
-        '.txt': 'text/plain',
-        '.html': 'text/html'
-    }
+    match = MEDIA_EXTENSION_RE.search(file_path)
+    media_type = MEDIA_TYPES[match.group(1).lower()] if match else 'application/octet-stream'
+    headers = {"Content-Disposition": f"attachment; filename={file_name}"}
     
-    media_type = media_types.get(file_extension, 'application/octet-stream')
+    # Let nginx stream the file with sendfile when it fronts the API
+    accel_path = _accel_redirect_path(file_path)
+    if accel_path:
+        return Response(
+            media_type=media_type,
+            headers={**headers, "X-Accel-Redirect": accel_path}
+        )
     
-    return FileResponse(
+    return LargeChunkFileResponse(
         path=file_path,
         media_type=media_type,
         filename=file_name,
-        headers={"Content-Disposition": f"attachment; filename={file_name}"}
+        stat_result=stat_result,
+        headers=headers
     )
 
 @router.post("/start-processing")
@@ -180,14 +310,14 @@ async def start_processing(
             detail="Email credentials not configured. Please set up email address and password."
         )
     
-    # Validate credentials before starting
-    import imaplib
+    # Validate credentials before starting, off the event loop and reusing a pooled session
     try:
-        mail = imaplib.IMAP4_SSL(email_config.imap_server)
-        mail.login(email_config.email_address, email_config.email_password)
-        mail.select('INBOX')
-        mail.close()
-        mail.logout()
+        await run_in_threadpool(
+            probe_imap_login,
+            email_config.imap_server,
+            email_config.email_address,
+            email_config.email_password
+        )
     except imaplib.IMAP4.error as e:
         error_msg = str(e).replace('b\'', '').replace('\'', '')
         if "AUTHENTICATIONFAILED" in error_msg:
@@ -208,6 +338,7 @@ async def start_processing(
     
     sleep_time = email_config.sleep_time
     await email_scheduler.start_processing(sleep_time)
+    _status_cache["value"] = None
     return {"status": "Email processing started successfully"}
 
 @router.post("/stop-processing")
@@ -217,6 +348,7 @@ async def stop_processing(_: User = Depends(get_current_user)):
         return {"status": "Email processing is not running"}
         
     await email_scheduler.stop_processing()
+    _status_cache["value"] = None
     return {"status": "Email processing stopped"}
 
 @router.post("/{order_id}/print-attachments")
@@ -226,9 +358,7 @@ async def print_order_attachments(
     _: User = Depends(get_current_user)
 ):
     """Manually print all attachments for an order"""
-    from app.services.printer_service import PrinterService
-    
-    order = db.query(OrderModel).filter(OrderModel.id == order_id).first()
+    order = db.get(OrderModel, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
@@ -236,23 +366,32 @@ async def print_order_attachments(
     if not attachments:
         return {"status": "No attachments found for this order"}
     
-    printer_service = PrinterService()
-    print_results = []
+    semaphore = asyncio.Semaphore(PRINT_CONCURRENCY)
+    
+    async def print_one(attachment: Attachment) -> bool:
+        async with semaphore:
+            return await printer_service.print_file(attachment)
     
-    for attachment in attachments:
-        try:
-            success = await printer_service.print_file(attachment)
+    # Submit print jobs concurrently; results come back in attachment order
+    outcomes = await asyncio.gather(
+        *(print_one(attachment) for attachment in attachments),
+        return_exceptions=True
+    )
+    
+    print_results = []
+    for attachment, outcome in zip(attachments, outcomes):
+        if isinstance(outcome, Exception):
             print_results.append({
                 "attachment_id": attachment.id,
                 "file_name": attachment.file_name,
-                "print_status": "success" if success else "failed"
+                "print_status": "error",
+                "error": str(outcome)
             })
-        except Exception as e:
+        else:
             print_results.append({
                 "attachment_id": attachment.id,
                 "file_name": attachment.file_name,
-                "print_status": "error",
-                "error": str(e)
+                "print_status": "success" if outcome else "failed"
             })
     
     return {
@@ -269,14 +408,10 @@ async def print_attachment(
     _: User = Depends(get_current_user)
 ):
     """Manually print a specific attachment"""
-    from app.services.printer_service import PrinterService
-    
-    attachment = db.query(Attachment).filter(Attachment.id == attachment_id).first()
+    attachment = db.get(Attachment, attachment_id)
     if not attachment:
         raise HTTPException(status_code=404, detail="Attachment not found")
     
-    printer_service = PrinterService()
-    
     try:
         success = await printer_service.print_file(attachment)
         return {
@@ -297,7 +432,7 @@ async def broadcast_status_update(status_data: dict):
     """Broadcast status update to all connected WebSocket clients"""
     try:
         await manager.broadcast_status_update(status_data)
-        print(f"📡 Broadcasted status update: {status_data}")
+        logger.debug("📡 Broadcasted status update: %s", status_data)
     except Exception as e:
-        print(f"❌ Failed to broadcast status update: {str(e)}")
+        logger.error("❌ Failed to broadcast status update: %s", e)
     
\ No newline at end of file
@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings
 from typing import List, Optional
 import os
+from functools import cached_property
 from dotenv import load_dotenv
 from pydantic import field_validator, Field
 
@@ -21,9 +22,9 @@ class Settings(BaseSettings):
     ALLOWED_SENDERS: str = os.getenv("ALLOWED_SENDERS", "")
     EMAIL_PROCESSING_ENABLED: bool = os.getenv("EMAIL_PROCESSING_ENABLED", "false").lower() == "true"
     
-    @property
+    @cached_property
     def allowed_senders_list(self) -> List[str]:
-        """Convert ALLOWED_SENDERS string to list"""
+        """Convert ALLOWED_SENDERS string to list (parsed once)"""
         if not self.ALLOWED_SENDERS:
             return []
         return [s.strip() for s in self.ALLOWED_SENDERS.split(",") if s.strip()]
@@ -37,11 +38,16 @@ class Settings(BaseSettings):
     BODY_PRINTER: str = "BodyPrinter"
     ATTACHMENT_PRINTER: str = "AttachmentPrinter"
 
+    # Attachment downloads via nginx X-Accel-Redirect (disabled when ATTACHMENT_ACCEL_ROOT is empty)
+    ATTACHMENT_ACCEL_ROOT: str = os.getenv("ATTACHMENT_ACCEL_ROOT", "")
+    ATTACHMENT_ACCEL_LOCATION: str = os.getenv("ATTACHMENT_ACCEL_LOCATION", "/_protected_attachments/")
+
     # Auth / JWT
     SECRET_KEY: str = os.getenv("SECRET_KEY", "change-me-in-prod")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "480"))  # 8 hours
     REFRESH_TOKEN_EXPIRE_DAYS: int = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))  # 7 days
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
+    PBKDF2_ROUNDS: int = int(os.getenv("PBKDF2_ROUNDS", "29000"))  # passlib's default cost
     
     # CORS Configuration
     ALLOWED_ORIGINS: List[str] = Field(default_factory=list)
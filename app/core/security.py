@@ -1,13 +1,17 @@
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 from app.core.config import settings
 import secrets
 
 
-# Use PBKDF2-SHA256 to avoid bcrypt's 72-byte password limit
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+# Use PBKDF2-SHA256 to avoid bcrypt's 72-byte password limit; cost is tunable via PBKDF2_ROUNDS
+pwd_context = CryptContext(
+    schemes=["pbkdf2_sha256"],
+    deprecated="auto",
+    pbkdf2_sha256__rounds=settings.PBKDF2_ROUNDS
+)
 
 
 def hash_password(password: str) -> str:
@@ -31,11 +35,17 @@ def create_refresh_token(subject: str, expires_days: Optional[int] = None) -> st
 
 
 def decode_access_token(token: str) -> Optional[str]:
+    claims = decode_access_token_claims(token)
+    return claims[0] if claims else None
+
+
+def decode_access_token_claims(token: str) -> Optional[Tuple[str, float]]:
+    """Return (subject, exp) for a valid access token, or None"""
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        if payload.get("type") != "access":
+        if payload.get("type") != "access" or not payload.get("sub"):
             return None
-        return payload.get("sub")
+        return payload["sub"], payload.get("exp", 0)
     except JWTError:
         return None
 
@@ -1,14 +1,26 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
+from app.core.logging_setup import setup_logging
 from app.db.base import Base
 from app.db.session import engine
 from app.websocket_manager import manager
+from app.services.printer_service import printer_service
+
+setup_logging()
 
 # Import endpoints (models will be imported automatically)
 from app.api.endpoints import orders, config, auth
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Let queued print jobs finish (and record their status) before exiting
+    await printer_service.shutdown()
+
 app = FastAPI(
+    lifespan=lifespan,
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
     openapi_url=f"{settings.API_V1_STR}/openapi.json"
@@ -21,6 +33,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Include routers
@@ -39,4 +52,6 @@ async def websocket_endpoint(websocket: WebSocket):
             # Echo back for testing (optional)
             await manager.send_personal_message(f"Echo: {data}", websocket)
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket)
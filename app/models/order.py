@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Float, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Float, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.base import Base
@@ -18,16 +18,21 @@ class Order(Base):
     status = Column(String(50))  # pending, processing, completed, failed
     folder_path = Column(String(255))
     
-    # Relationships
-    print_jobs = relationship("PrintJob", back_populates="order")
-    attachments = relationship("Attachment", back_populates="order")
-    processing_logs = relationship("ProcessingLog", back_populates="order")
+    # Relationships (lazy="raise": load explicitly, e.g. with selectinload, to avoid N+1 queries)
+    print_jobs = relationship("PrintJob", back_populates="order", cascade="all, delete-orphan", passive_deletes=True, lazy="raise")
+    attachments = relationship("Attachment", back_populates="order", cascade="all, delete-orphan", passive_deletes=True, lazy="raise")
+    processing_logs = relationship("ProcessingLog", back_populates="order", cascade="all, delete-orphan", passive_deletes=True, lazy="raise")
+
+    __table_args__ = (
+        # Serves the newest-first listing and keyset pagination in get_orders/get_latest_order
+        Index("ix_orders_processed_time_id_desc", processed_time.desc(), id.desc()),
+    )
 
 class PrintJob(Base):
     __tablename__ = "print_jobs"
 
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"))
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), index=True)
     job_type = Column(String(50))  # DTF, Sublimation, ProColor, Glitter
     total_print_length = Column(Float)  # in inches
     gang_sheets = Column(Integer)  # number of gang sheets
@@ -40,7 +45,7 @@ class Attachment(Base):
     __tablename__ = "attachments"
 
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"))
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), index=True)
     file_name = Column(String(255))
     file_path = Column(String(255))  # Original file path
     pdf_path = Column(String(255))   # PDF version path
@@ -56,7 +61,7 @@ class ProcessingLog(Base):
     __tablename__ = "processing_logs"
 
     id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.id"))
+    order_id = Column(Integer, ForeignKey("orders.id", ondelete="CASCADE"), index=True)
     timestamp = Column(DateTime, default=datetime.utcnow)
     action = Column(String(100))
     status = Column(String(50))
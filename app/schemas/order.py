@@ -55,6 +55,19 @@ class Order(OrderBase):
     class Config:
         from_attributes = True
 
+class OrderListItem(BaseModel):
+    """Summary row for the orders list; the full Order comes from GET /orders/{id}"""
+    id: int
+    po_number: Optional[str] = None
+    order_type: Optional[str] = None
+    customer_name: Optional[str] = None
+    committed_shipping_date: Optional[datetime] = None
+    processed_time: Optional[datetime] = None
+    status: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
 class EmailConfigBase(BaseModel):
     email_address: str
     imap_server: str
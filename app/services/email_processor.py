@@ -2,27 +2,39 @@ import imaplib
 import email
 from email.header import decode_header
 import os
+import shutil
 import re
 from datetime import datetime
 import ssl
 from typing import Optional, Tuple, List, Dict
 import asyncio
+import hashlib
+import logging
+from functools import lru_cache
+import threading
+import time
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 import subprocess
+import aiofiles
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import inch
 from PIL import Image
-from bs4 import BeautifulSoup
+from selectolax.lexbor import LexborHTMLParser
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from urllib.parse import urlparse, unquote
 
 from app.core.config import settings
+from app.db.session import SessionLocal
 from app.models.order import Order, Attachment, ProcessingLog, PrintJob, EmailConfig as EmailConfigModel
-from app.services.printer_service import PrinterService
+from app.services.printer_service import printer_service
 from app.services.file_downloader import file_downloader
 from app.websocket_manager import manager
 
+logger = logging.getLogger(__name__)
+
 # Order type mapping - maps human-readable names to internal format
 ORDER_TYPE_MAPPING = {
     "DTF": "dtf_textile",
@@ -42,36 +54,122 @@ ORDER_TYPE_MAPPING = {
 # Reverse mapping for lookups
 INTERNAL_TO_DISPLAY = {v: k for k, v in ORDER_TYPE_MAPPING.items()}
 
-def get_email_body(msg):
-    """Extract plain text body from email."""
-    if msg.is_multipart():
-        for part in msg.walk():
-            ctype = part.get_content_type()
-            disp = str(part.get("Content-Disposition"))
-            if ctype == "text/plain" and "attachment" not in disp:
-                return part.get_payload(decode=True).decode(errors="ignore")
-    else:
-        return msg.get_payload(decode=True).decode(errors="ignore")
-    return ""
-
-def get_email_html_body(msg):
-    """Extract HTML body from email."""
-    if msg.is_multipart():
-        for part in msg.walk():
-            ctype = part.get_content_type()
-            disp = str(part.get("Content-Disposition"))
-            if ctype == "text/html" and "attachment" not in disp:
-                try:
-                    return part.get_payload(decode=True).decode(errors="ignore")
-                except:
-                    return None
-    else:
-        if msg.get_content_type() == "text/html":
-            try:
-                return msg.get_payload(decode=True).decode(errors="ignore")
-            except:
-                return None
-    return None
+# Patterns used to parse order emails, compiled once at import
+WHITESPACE_RE = re.compile(r"\s+")
+DATE_UP_TO_YEAR_RE = re.compile(r"^(.*?\b\d{4})\b")
+PRINT_LENGTH_RE = re.compile(r"Total Print Length:\s*([\d.]+)\s*inches")
+ORDER_TYPE_RE = re.compile(r"Order Type:\s*(.+?)(?:\n|$)")
+ORDER_TYPE_ALT_RES = (
+    re.compile(r"Order Types?:\s*(.+?)(?:\n|$)"),
+    re.compile(r"Type:\s*(.+?)(?:\n|$)"),
+    re.compile(r"Order:\s*(.+?)(?:\n|$)"),
+)
+# *emphasis* (group 1 is kept), HTML tags and URLs, stripped from addresses in one pass
+ADDRESS_CLEAN_RE = re.compile(r'\*([^*]+)\*|<[^>]+>|https?://[^\s]+')
+INVALID_FOLDER_CHARS = str.maketrans({c: '_' for c in '<>:"/\\|?*'})
+GANG_SHEET_NUMBER_RE = re.compile(r'Gang Sheet #?(\d+)', re.IGNORECASE)
+ZERO_WIDTH_CHARS_RE = re.compile(r'[\u200B-\u200D\uFEFF\u2060]')
+PO_NUMBER_RE = re.compile(r"PO Number:\s*([^\r\n]+?)\s*(?=(?:\r?\n|Order Type:))", re.IGNORECASE)
+PARENTHETICAL_RE = re.compile(r"\(.*?\)")
+TRAILING_ORDER_RE = re.compile(r"\s*Order$", re.IGNORECASE)
+PO_CLEAN_RE = re.compile(r"([A-Za-z0-9_-]+)")
+QUALITY_CHECK_RE = re.compile(r"Requires Quality Check:\s*(Yes|No)")
+DELIVERY_ADDRESS_RE = re.compile(r"Delivery address:(.*?)(?=\n\n|\Z)", re.DOTALL)
+SHIPPING_DATE_RE = re.compile(r"Committed Shipping Date:\s*(.+?)(?:\n|$)")
+SHEET_NUMBER_RE = re.compile(r"#(\d+)")
+DOWNLOAD_WORD_RE = re.compile(r"download", re.IGNORECASE)
+FETCH_UID_RE = re.compile(rb"UID (\d+)")
+
+# Shared HTTP session for download links; pooled connections are reused across
+# files and emails. Downloads for one order run at most URL_DOWNLOAD_CONCURRENCY at a time.
+URL_DOWNLOAD_CONCURRENCY = 8
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+# Email attachments for one order are decoded and written at most this many at a time
+ATTACHMENT_SAVE_CONCURRENCY = 4
+HTTP_SESSION = requests.Session()
+HTTP_SESSION.headers['User-Agent'] = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+# Transient CDN hiccups are retried on the pooled connection instead of failing the file
+HTTP_ADAPTER = HTTPAdapter(
+    pool_maxsize=URL_DOWNLOAD_CONCURRENCY,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=(502, 503, 504))
+)
+HTTP_SESSION.mount('http://', HTTP_ADAPTER)
+HTTP_SESSION.mount('https://', HTTP_ADAPTER)
+
+# wkhtmltopdf binary: system install in Docker (Linux), bundled copy on Windows
+WKHTMLTOPDF_PATH = "wkhtmltopdf" if os.name == 'posix' else "lib/wkhtmltox/bin/wkhtmltopdf.exe"
+WKHTMLTOPDF_AVAILABLE = shutil.which(WKHTMLTOPDF_PATH) is not None or os.path.exists(WKHTMLTOPDF_PATH)
+# Fixed wkhtmltopdf arguments; only the input and output paths change per call
+WKHTMLTOPDF_ARGS = (
+    WKHTMLTOPDF_PATH,
+    "--page-size", "Letter",
+    "--margin-top", "0.75in",
+    "--margin-right", "0.75in",
+    "--margin-bottom", "0.75in",
+    "--margin-left", "0.75in",
+    "--encoding", "UTF-8",
+    "--no-outline",
+    "--enable-local-file-access",
+)
+
+# TLS context shared by IMAP connections; loading the CA bundle is expensive
+IMAP_SSL_CONTEXT = ssl.create_default_context()
+
+# Per-order-type patterns, keyed by ORDER_TYPE_MAPPING names
+JOB_SECTION_RES = {
+    job_type: re.compile(rf"{re.escape(job_type)}.*?(?=\n\n|\Z)", re.DOTALL)
+    for job_type in ORDER_TYPE_MAPPING
+}
+JOB_GANG_SHEET_RES = {
+    job_type: re.compile(rf"{re.escape(job_type)} Gang Sheet #\d+")
+    for job_type in ORDER_TYPE_MAPPING
+}
+
+# One scan finds every order type (and alias) named in a link's context.
+# Longer names are tried first so "UV DTF" is not read as plain "DTF".
+ORDER_TYPE_ALIASES = {"UV-DTF": "UV DTF", "UVDTF": "UV DTF"}
+ORDER_TYPE_BY_TERM = {
+    term.lower(): ORDER_TYPE_ALIASES.get(term, term)
+    for term in list(ORDER_TYPE_MAPPING) + list(ORDER_TYPE_ALIASES)
+}
+ORDER_TYPE_SCAN_RE = re.compile(
+    r"\b(" + "|".join(re.escape(term) for term in sorted(ORDER_TYPE_BY_TERM, key=len, reverse=True)) + r")\b",
+    re.IGNORECASE
+)
+ORDER_TYPE_PRIORITY = {order_type: index for index, order_type in enumerate(ORDER_TYPE_MAPPING)}
+ORDER_TYPE_KEYS = frozenset(ORDER_TYPE_MAPPING)
+# Case-sensitive scan of attachment filenames for order type names, longest first
+FILENAME_ORDER_TYPE_RE = re.compile(
+    "|".join(re.escape(job_type) for job_type in sorted(ORDER_TYPE_MAPPING, key=len, reverse=True))
+)
+
+def extract_bodies(msg) -> Tuple[str, Optional[str]]:
+    """Extract the plain text and HTML bodies from an email in a single MIME walk."""
+    if not msg.is_multipart():
+        try:
+            payload = msg.get_payload(decode=True).decode(errors="ignore")
+        except Exception:
+            return "", None
+        return payload, payload if msg.get_content_type() == "text/html" else None
+
+    plain, html = None, None
+    for part in msg.walk():
+        ctype = part.get_content_type()
+        if ctype not in ("text/plain", "text/html"):
+            continue
+        if "attachment" in str(part.get("Content-Disposition")):
+            continue
+        try:
+            payload = part.get_payload(decode=True).decode(errors="ignore")
+        except Exception:
+            payload = None
+        if ctype == "text/plain" and plain is None:
+            plain = payload
+        elif ctype == "text/html" and html is None:
+            html = payload
+        if plain is not None and html is not None:
+            break
+    return plain or "", html
 
 def decode_email_subject(subject):
     """Decode email subject with proper charset handling."""
@@ -101,9 +199,9 @@ def parse_date(date_str: str) -> datetime:
         return datetime.utcnow()
 
     # Normalize whitespace and strip any text after the year
-    cleaned = re.sub(r"\s+", " ", date_str).strip()
+    cleaned = WHITESPACE_RE.sub(" ", date_str).strip()
     # Keep only up to the first 4-digit year
-    m = re.search(r"^(.*?\b\d{4})\b", cleaned)
+    m = DATE_UP_TO_YEAR_RE.search(cleaned)
     if m:
         cleaned = m.group(1)
 
@@ -123,37 +221,35 @@ def parse_date(date_str: str) -> datetime:
 
 def parse_print_length(text: str) -> float:
     """Extract print length from text like: Total Print Length: 98.74 inches"""
-    match = re.search(r"Total Print Length:\s*([\d.]+)\s*inches", text)
+    match = PRINT_LENGTH_RE.search(text)
     return float(match.group(1)) if match else 0.0
 
 def parse_order_types(text: str) -> List[str]:
     """Extract order types from text like: Order Type: Sublimation + DTF + ProColor + Glitter"""
-    match = re.search(r"Order Type:\s*(.+?)(?:\n|$)", text)
+    match = ORDER_TYPE_RE.search(text)
     if match:
         order_type_text = match.group(1)
         order_types = [t.strip() for t in order_type_text.split("+")]
         return order_types
     else:
         # Try alternative patterns
-        alt_patterns = [
-            r"Order Types?:\s*(.+?)(?:\n|$)",
-            r"Type:\s*(.+?)(?:\n|$)",
-            r"Order:\s*(.+?)(?:\n|$)"
-        ]
-        for pattern in alt_patterns:
-            alt_match = re.search(pattern, text)
+        for pattern in ORDER_TYPE_ALT_RES:
+            alt_match = pattern.search(text)
             if alt_match:
                 order_type_text = alt_match.group(1)
                 order_types = [t.strip() for t in order_type_text.split("+")]
                 return order_types
     return []
 
+def _clean_address_match(match: re.Match) -> str:
+    """Unwrap *emphasis* (cleaning what it wraps too); drop tags and URLs"""
+    emphasized = match.group(1)
+    return ADDRESS_CLEAN_RE.sub(_clean_address_match, emphasized) if emphasized else ''
+
 def parse_address(text: str) -> Tuple[str, str]:
     """Extract name and address from delivery address section"""
-    # Clean the text by removing markdown formatting and special characters
-    cleaned_text = re.sub(r'\*([^*]+)\*', r'\1', text)  # Remove asterisks around text
-    cleaned_text = re.sub(r'<[^>]+>', '', cleaned_text)  # Remove HTML tags
-    cleaned_text = re.sub(r'https?://[^\s]+', '', cleaned_text)  # Remove URLs
+    # Clean the text by removing markdown formatting, HTML tags and URLs
+    cleaned_text = ADDRESS_CLEAN_RE.sub(_clean_address_match, text)
     
     lines = [line.strip() for line in cleaned_text.strip().split("\n") if line.strip()]
     
@@ -170,44 +266,100 @@ def parse_address(text: str) -> Tuple[str, str]:
 
 def count_gang_sheets(text: str, job_type: str) -> int:
     """Count number of gang sheets for a specific job type"""
-    pattern = rf"{job_type} Gang Sheet #\d+"
-    return len(re.findall(pattern, text))
+    return len(JOB_GANG_SHEET_RES[job_type].findall(text))
 
 def sanitize_folder_name(name: str) -> str:
     """Sanitize folder name by removing invalid characters"""
     # Remove or replace invalid characters for Windows filesystem
-    invalid_chars = r'[<>:"/\\|?*]'
-    sanitized = re.sub(invalid_chars, '_', name)
+    sanitized = name.translate(INVALID_FOLDER_CHARS)
     # Remove extra spaces and limit length
-    sanitized = re.sub(r'\s+', ' ', sanitized).strip()
+    sanitized = WHITESPACE_RE.sub(' ', sanitized).strip()
     return sanitized[:50]  # Limit to 50 characters
 
+@lru_cache(maxsize=1024)
+def _parse_order_details_cached(body: str) -> Tuple:
+    """Regex-parse an order email body; results are immutable so resent emails can reuse them"""
+    # Extract PO Number
+    # Handle variations:
+    # - Collapsed lines: "PO Number: 22121Order Type: ..." → stop before "Order Type:"
+    # - Alphanumeric POs: "1R (Replacement)" → keep "1R"
+    # - Long numeric POs
+    po_match = PO_NUMBER_RE.search(body)
+    raw_po = po_match.group(1).strip() if po_match else None
+    if raw_po:
+        # Remove any parenthetical notes, e.g., "1R (Replacement)" → "1R"
+        raw_po = PARENTHETICAL_RE.sub("", raw_po).strip()
+        # If the collapsed text still ends with the word 'Order', drop it
+        raw_po = TRAILING_ORDER_RE.sub("", raw_po).strip()
+        # Finally, allow alphanumeric and dashes/underscores only
+        po_clean_match = PO_CLEAN_RE.match(raw_po)
+        po_number = po_clean_match.group(1) if po_clean_match else raw_po
+    else:
+        po_number = None
+
+    # Extract order types
+    order_types = parse_order_types(body)
+    
+    # Extract quality check requirement
+    qc_match = QUALITY_CHECK_RE.search(body)
+    requires_qc = qc_match is not None and qc_match.group(1) == "Yes"
+    
+    # Extract delivery address
+    address_section = DELIVERY_ADDRESS_RE.search(body)
+    customer_name, delivery_address = parse_address(address_section.group(1)) if address_section else ("", "")
+    
+    # Extract shipping date
+    # Kept raw: parse_date falls back to "now", which must not be cached
+    date_match = SHIPPING_DATE_RE.search(body)
+    shipping_date_text = date_match.group(1) if date_match else None
+
+    # Extract print jobs
+    print_jobs = []
+    # Only visit the mapped types this email mentions, still in ORDER_TYPE_MAPPING order
+    mentioned_types = sorted(ORDER_TYPE_KEYS.intersection(order_types), key=ORDER_TYPE_PRIORITY.__getitem__)
+    for job_type in mentioned_types:
+        # Find section for this job type
+        section_match = JOB_SECTION_RES[job_type].search(body)
+        if section_match:
+            section = section_match.group(0)
+            print_jobs.append((job_type, parse_print_length(section), count_gang_sheets(section, job_type)))
+
+    order_type_string = " + ".join(order_types) if order_types else "Unknown"
+
+    return (po_number, order_type_string, requires_qc, customer_name, delivery_address,
+            shipping_date_text, tuple(print_jobs))
+
 def extract_download_urls_from_html(html_content: str) -> List[Dict[str, str]]:
     """Extract download URLs from HTML email body with their context"""
-    if not html_content:
+    # Skip building a DOM for emails that cannot contain a download link
+    if not html_content or not DOWNLOAD_WORD_RE.search(html_content):
         return []
     
     try:
-        soup = BeautifulSoup(html_content, 'html.parser')
+        tree = LexborHTMLParser(html_content)
         download_links = []
+        # Links in the same block share a context ancestor; extract its text once
+        context_by_ancestor = {}
         
         # Find all links with "Download" text
-        for link in soup.find_all('a', href=True):
-            link_text = link.get_text(strip=True)
+        for link in tree.css('a[href]'):
+            link_text = link.text(strip=True)
             if 'download' in link_text.lower():
-                url = link['href']
+                url = link.attributes.get('href') or ''
                 
-                # Try to determine the order type and context
-                # Look at parent elements for context
-                context = ""
-                parent = link.parent
-                for _ in range(5):  # Check up to 5 parent levels
-                    if parent:
-                        parent_text = parent.get_text(strip=True)
-                        context = parent_text
-                        parent = parent.parent
-                    else:
+                # Try to determine the order type and context from the text of
+                # the ancestor up to 5 levels above the link
+                ancestor = link
+                for _ in range(5):
+                    if ancestor.parent is None:
                         break
+                    ancestor = ancestor.parent
+                if ancestor is link:
+                    context = ""
+                else:
+                    context = context_by_ancestor.get(ancestor.mem_id)
+                    if context is None:
+                        context = context_by_ancestor[ancestor.mem_id] = ancestor.text(strip=True)
                 
                 download_links.append({
                     'url': url,
@@ -220,6 +372,18 @@ def extract_download_urls_from_html(html_content: str) -> List[Dict[str, str]]:
         print(f"❌ Error extracting URLs from HTML: {str(e)}")
         return []
 
+def detect_sheet_from_filename(filename: str) -> Tuple[Optional[str], Optional[int]]:
+    """Detect gang sheet type and number from an attachment filename
+    Returns: (sheet_type, sheet_number) or (None, None)
+    """
+    found = {m.group(0) for m in FILENAME_ORDER_TYPE_RE.finditer(filename)}
+    if not found:
+        return (None, None)
+    job_type = min(found, key=ORDER_TYPE_PRIORITY.__getitem__)
+    num_match = SHEET_NUMBER_RE.search(filename)
+    return (f"{job_type} Gang Sheet", int(num_match.group(1)) if num_match else 1)
+
+@lru_cache(maxsize=256)
 def detect_order_type_from_context(context: str, link_text: str) -> Optional[Tuple[str, int]]:
     """Detect order type and sheet number from context
     Returns: (order_type, sheet_number) or None
@@ -229,19 +393,16 @@ def detect_order_type_from_context(context: str, link_text: str) -> Optional[Tup
     
     # Try to find gang sheet number
     sheet_number = 1
-    sheet_match = re.search(r'Gang Sheet #?(\d+)', full_text, re.IGNORECASE)
+    sheet_match = GANG_SHEET_NUMBER_RE.search(full_text)
     if sheet_match:
         sheet_number = int(sheet_match.group(1))
     
-    # Check for each order type
-    for order_type in ORDER_TYPE_MAPPING.keys():
-        # Case-insensitive search for order type
-        if re.search(r'\b' + re.escape(order_type) + r'\b', full_text, re.IGNORECASE):
-            return (order_type, sheet_number)
+    # Find every order type mentioned; if several are, ORDER_TYPE_MAPPING order decides
+    found = {ORDER_TYPE_BY_TERM[m.group(1).lower()] for m in ORDER_TYPE_SCAN_RE.finditer(full_text)}
+    if found:
+        return (min(found, key=ORDER_TYPE_PRIORITY.__getitem__), sheet_number)
     
     # Check for variations
-    if 'UV DTF' in full_text or 'UV-DTF' in full_text or 'UVDTF' in full_text:
-        return ('UV DTF', sheet_number)
     if 'Glow' in full_text:
         return ('Glow in the Dark', sheet_number)
     if 'Gold' in full_text and 'Foil' in full_text:
@@ -249,6 +410,17 @@ def detect_order_type_from_context(context: str, link_text: str) -> Optional[Tup
         
     return None
 
+def _fetch_url_to_file(url: str, save_path: str, timeout: int) -> int:
+    """Stream url into save_path with the shared HTTP session (blocking); returns the file size"""
+    with HTTP_SESSION.get(url, timeout=timeout, stream=True) as response:
+        response.raise_for_status()  # Raise exception for bad status codes
+        
+        # Save the file, copying straight from the raw stream (still gzip-decoded)
+        response.raw.decode_content = True
+        with open(save_path, 'wb') as f:
+            shutil.copyfileobj(response.raw, f, length=DOWNLOAD_CHUNK_SIZE)
+            return f.tell()
+
 async def download_file_from_url(url: str, save_path: str, timeout: int = 60) -> bool:
     """Download file from URL and save to specified path
     
@@ -261,41 +433,26 @@ async def download_file_from_url(url: str, save_path: str, timeout: int = 60) ->
         True if successful, False otherwise
     """
     try:
-        # Clean the URL by removing problematic characters
-        import re
         # Remove zero-width characters and other problematic unicode
-        cleaned_url = re.sub(r'[\u200B-\u200D\uFEFF\u2060]', '', url).strip()
+        cleaned_url = ZERO_WIDTH_CHARS_RE.sub('', url).strip()
         
-        print(f"📥 Downloading from URL: {cleaned_url}")
+        logger.info(f"📥 Downloading from URL: {cleaned_url}")
         if cleaned_url != url:
-            print(f"🔧 URL cleaned (removed problematic characters)")
-        
-        # Make the request with a user agent to avoid blocking
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
+            logger.info(f"🔧 URL cleaned (removed problematic characters)")
         
-        response = requests.get(cleaned_url, headers=headers, timeout=timeout, stream=True)
-        response.raise_for_status()  # Raise exception for bad status codes
-        
-        # Save the file
-        with open(save_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-        
-        file_size = os.path.getsize(save_path)
-        print(f"✅ Downloaded successfully: {save_path} ({file_size} bytes)")
+        # The transfer itself runs in a worker thread so the event loop stays free
+        file_size = await asyncio.to_thread(_fetch_url_to_file, cleaned_url, save_path, timeout)
+        logger.info(f"✅ Downloaded successfully: {save_path} ({file_size} bytes)")
         return True
         
     except requests.exceptions.Timeout:
-        print(f"❌ Download timed out after {timeout} seconds: {url}")
+        logger.error(f"❌ Download timed out after {timeout} seconds: {url}")
         return False
     except requests.exceptions.RequestException as e:
-        print(f"❌ Failed to download from URL: {str(e)}")
+        logger.error(f"❌ Failed to download from URL: {str(e)}")
         return False
     except Exception as e:
-        print(f"❌ Unexpected error during download: {str(e)}")
+        logger.error(f"❌ Unexpected error during download: {str(e)}")
         return False
 
 def get_filename_from_url(url: str, default_name: str = "download") -> str:
@@ -317,6 +474,20 @@ def get_filename_from_url(url: str, default_name: str = "download") -> str:
     except:
         return f"{default_name}.png"
 
+def reserve_unique_path(directory: str, filename: str) -> str:
+    """Atomically create an empty file named filename (or name_1.ext, name_2.ext, ...) in directory
+    Returns: the path of the created file
+    """
+    name, ext = os.path.splitext(filename)
+    counter = 0
+    while True:
+        file_path = os.path.join(directory, f"{name}_{counter}{ext}" if counter else filename)
+        try:
+            os.close(os.open(file_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+            return file_path
+        except FileExistsError:
+            counter += 1
+
 def convert_image_to_4x6_pdf(img_path: str, output_pdf: str, top_margin_inch: float = -0.5) -> bool:
     """Convert image to 4x6 inch PDF label"""
     try:
@@ -353,168 +524,184 @@ def convert_image_to_4x6_pdf(img_path: str, output_pdf: str, top_margin_inch: fl
         print(f"❌ Failed to convert image to PDF: {str(e)}")
         return False
 
+# Letter size page (8.5 x 11 in) for the ReportLab email-body fallback
+LETTER_PAGE_SIZE = (8.5 * inch, 11.0 * inch)
+
 def convert_html_to_letter_pdf(html_content: str, output_pdf: str) -> bool:
     """Convert HTML content to letter-size PDF"""
     try:
-        # Letter size dimensions
-        width_inch = 8.5
-        height_inch = 11.0
-        
         # Create PDF canvas
-        c = canvas.Canvas(output_pdf, pagesize=(width_inch * inch, height_inch * inch))
+        c = canvas.Canvas(output_pdf, pagesize=LETTER_PAGE_SIZE)
         
         # Add text content (simplified - in real implementation you'd parse HTML)
+        # as one text object with 20pt leading rather than a drawString per line
         text_lines = html_content.split('\n')
-        y_position = height_inch * inch - 50
+        text = c.beginText(50, LETTER_PAGE_SIZE[1] - 50)
+        text.setLeading(20)
         
         for line in text_lines[:50]:  # Limit to first 50 lines
-            if y_position < 50:  # Stop if we reach bottom margin
+            if text.getY() < 50:  # Stop if we reach bottom margin
                 break
-            c.drawString(50, y_position, line[:80])  # Limit line length
-            y_position -= 20
-            
+            text.textLine(line[:80])  # Limit line length
+        
+        c.drawText(text)
         c.save()
         
-        print(f"✅ Email body PDF created successfully: {output_pdf}")
+        logger.info(f"✅ Email body PDF created successfully: {output_pdf}")
         return True
         
     except Exception as e:
-        print(f"❌ Failed to convert HTML to PDF: {str(e)}")
+        logger.error(f"❌ Failed to convert HTML to PDF: {str(e)}")
         return False
 
 def convert_html_to_pdf(html_file_path: str, pdf_file_path: str) -> bool:
     """Convert HTML file to PDF using wkhtmltopdf"""
+    return _run_wkhtmltopdf(html_file_path, pdf_file_path)
+
+def convert_html_string_to_pdf(html_content: str, pdf_file_path: str) -> bool:
+    """Convert an HTML string to PDF by piping it to wkhtmltopdf's stdin, with no HTML file on disk"""
+    return _run_wkhtmltopdf("-", pdf_file_path, html_content.encode('utf-8'))
+
+def _run_wkhtmltopdf(html_source: str, pdf_file_path: str, html_input: Optional[bytes] = None) -> bool:
+    """Run wkhtmltopdf on a file path, or on html_input when html_source is "-" """
     try:
-        # Detect if running in Docker (Linux) or Windows
-        if os.name == 'posix':  # Linux/Mac (Docker)
-            wkhtmltopdf_path = "wkhtmltopdf"  # Use system wkhtmltopdf
-        else:  # Windows
-            wkhtmltopdf_path = "lib/wkhtmltox/bin/wkhtmltopdf.exe"
-        
-        # Check if the executable exists (for Windows)
-        if os.name != 'posix' and not os.path.exists(wkhtmltopdf_path):
-            print(f"❌ wkhtmltopdf executable not found at {wkhtmltopdf_path}")
+        if not WKHTMLTOPDF_AVAILABLE:
+            logger.error(f"❌ wkhtmltopdf executable not found at {WKHTMLTOPDF_PATH}")
             return False
         
         # Build command
-        cmd = [
-            wkhtmltopdf_path,
-            "--page-size", "Letter",
-            "--margin-top", "0.75in",
-            "--margin-right", "0.75in", 
-            "--margin-bottom", "0.75in",
-            "--margin-left", "0.75in",
-            "--encoding", "UTF-8",
-            "--no-outline",
-            "--enable-local-file-access",
-            html_file_path,
-            pdf_file_path
-        ]
+        cmd = [*WKHTMLTOPDF_ARGS, html_source, pdf_file_path]
         
-        print("Executing wkhtmltopdf command:")
-        print(" ".join(cmd))
+        logger.info(f"Executing wkhtmltopdf command: {' '.join(cmd)}")
         
-        # Execute command
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+        # Execute command; stdout is unused and stderr is only decoded on failure
+        result = subprocess.run(
+            cmd, input=html_input, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=30
+        )
         
         if result.returncode == 0:
-            print(f"✅ Converted HTML to PDF: {html_file_path} -> {pdf_file_path}")
+            logger.info(f"✅ Converted HTML to PDF: {html_source} -> {pdf_file_path}")
             return True
         else:
-            print(f"❌ Failed to convert HTML to PDF. Error code: {result.returncode}")
-            print(f"Error output: {result.stderr}")
+            logger.error(
+                f"❌ Failed to convert HTML to PDF. Error code: {result.returncode}\n"
+                f"Error output: {result.stderr.decode('utf-8', errors='replace')}"
+            )
             return False
             
     except subprocess.TimeoutExpired:
-        print("❌ PDF conversion timed out")
+        logger.error("❌ PDF conversion timed out")
         return False
     except Exception as e:
-        print(f"❌ Unexpected error during PDF conversion: {str(e)}")
+        logger.error(f"❌ Unexpected error during PDF conversion: {str(e)}")
         return False
 
+# Logged-in IMAP sessions reused by credential checks, keyed by
+# (server, address, password hash) and dropped after IMAP_POOL_TTL seconds
+IMAP_POOL_TTL = 300
+_imap_pool: Dict[Tuple[str, str, str], Tuple[imaplib.IMAP4_SSL, float]] = {}
+_imap_pool_lock = threading.Lock()
+
+def _close_imap(mail: imaplib.IMAP4_SSL):
+    try:
+        mail.logout()
+    except Exception:
+        pass
+
+def probe_imap_login(imap_server: str, email_address: str, email_password: str):
+    """Log in to the inbox, reusing a pooled session for the same credentials.
+
+    Raises imaplib.IMAP4.error when the credentials are rejected.
+    """
+    key = (imap_server, email_address, hashlib.sha256(email_password.encode()).hexdigest())
+    now = time.monotonic()
+    with _imap_pool_lock:
+        expired = [k for k, (_, created) in _imap_pool.items() if now - created > IMAP_POOL_TTL]
+        stale = [_imap_pool.pop(k)[0] for k in expired]
+        # Take the session out of the pool while in use; imaplib is not thread-safe
+        pooled = _imap_pool.pop(key, None)
+    for mail in stale:
+        _close_imap(mail)
+
+    if pooled:
+        mail, created = pooled
+        try:
+            if mail.noop()[0] == 'OK':
+                with _imap_pool_lock:
+                    _imap_pool[key] = (mail, created)
+                return
+        except Exception:
+            pass
+        _close_imap(mail)
+
+    mail = imaplib.IMAP4_SSL(imap_server, ssl_context=IMAP_SSL_CONTEXT)
+    try:
+        mail.login(email_address, email_password)
+        mail.select('INBOX')
+    except Exception:
+        _close_imap(mail)
+        raise
+    with _imap_pool_lock:
+        _imap_pool[key] = (mail, now)
+
 class EmailProcessor:
     def __init__(self, db: Session):
         self.db = db
         self.mail = None
-        self.printer_service = PrinterService()
-        self.is_running = False
+        self.printer_service = printer_service
+        # Attachments of the order being processed, queued for printing after it commits
+        self.pending_prints = []
+        self._running = threading.Event()
         self.download_path = "C:\\downloads"  # Default download path
 
+    @property
+    def is_running(self) -> bool:
+        return self._running.is_set()
+
+    @is_running.setter
+    def is_running(self, value: bool):
+        if value:
+            self._running.set()
+        else:
+            self._running.clear()
+
     def log_to_db(self, action: str, status: str, error_message: Optional[str] = None, order_id: Optional[int] = None):
-        """Log actions to database"""
+        """Log actions to database
+
+        Uses its own session so logging mid-order neither commits nor rolls back the
+        order's pending attachments in self.db.
+        """
         log = ProcessingLog(
             order_id=order_id,
             action=action,
             status=status,
             error_message=error_message
         )
-        self.db.add(log)
-        try:
-            self.db.commit()
-            print(f"📝 Logged: {action} - {status}")
-        except Exception as e:
-            print(f"❌ Failed to log: {str(e)}")
-            self.db.rollback()
+        with SessionLocal() as db:
+            db.add(log)
+            try:
+                db.commit()
+                print(f"📝 Logged: {action} - {status}")
+            except Exception as e:
+                print(f"❌ Failed to log: {str(e)}")
+                db.rollback()
 
     def parse_order_details(self, body: str) -> Dict:
         """Parse order details from email body"""
-        # Extract PO Number
-        # Handle variations:
-        # - Collapsed lines: "PO Number: 22121Order Type: ..." → stop before "Order Type:"
-        # - Alphanumeric POs: "1R (Replacement)" → keep "1R"
-        # - Long numeric POs
-        po_match = re.search(r"PO Number:\s*([^\r\n]+?)\s*(?=(?:\r?\n|Order Type:))", body, re.IGNORECASE)
-        raw_po = po_match.group(1).strip() if po_match else None
-        if raw_po:
-            # Remove any parenthetical notes, e.g., "1R (Replacement)" → "1R"
-            raw_po = re.sub(r"\(.*?\)", "", raw_po).strip()
-            # If the collapsed text still ends with the word 'Order', drop it
-            raw_po = re.sub(r"\s*Order$", "", raw_po, flags=re.IGNORECASE).strip()
-            # Finally, allow alphanumeric and dashes/underscores only
-            po_clean_match = re.match(r"([A-Za-z0-9_-]+)", raw_po)
-            po_number = po_clean_match.group(1) if po_clean_match else raw_po
-        else:
-            po_number = None
+        (po_number, order_type_string, requires_qc, customer_name, delivery_address,
+         shipping_date_text, print_jobs) = _parse_order_details_cached(body)
 
-        # Extract order types
-        order_types = parse_order_types(body)
-        
-        # Extract quality check requirement
-        requires_qc = "Yes" in re.search(r"Requires Quality Check:\s*(Yes|No)", body).group(1) if re.search(r"Requires Quality Check:", body) else False
-        
-        # Extract delivery address
-        address_section = re.search(r"Delivery address:(.*?)(?=\n\n|\Z)", body, re.DOTALL)
-        customer_name, delivery_address = parse_address(address_section.group(1)) if address_section else ("", "")
-        
-        # Extract shipping date
-        date_match = re.search(r"Committed Shipping Date:\s*(.+?)(?:\n|$)", body)
-        shipping_date = parse_date(date_match.group(1)) if date_match else datetime.utcnow()
-
-        # Extract print jobs
-        print_jobs = []
-        # Support all order types from the mapping
-        for job_type in ORDER_TYPE_MAPPING.keys():
-            if job_type in order_types:
-                # Find section for this job type
-                section_match = re.search(rf"{job_type}.*?(?=\n\n|\Z)", body, re.DOTALL)
-                if section_match:
-                    section = section_match.group(0)
-                    print_jobs.append({
-                        "job_type": job_type,
-                        "total_print_length": parse_print_length(section),
-                        "gang_sheets": count_gang_sheets(section, job_type)
-                    })
-
-        order_type_string = " + ".join(order_types) if order_types else "Unknown"
-        
         return {
             "po_number": po_number,
             "order_type": order_type_string,
             "requires_quality_check": requires_qc,
             "customer_name": customer_name,
             "delivery_address": delivery_address,
-            "committed_shipping_date": shipping_date,
-            "print_jobs": print_jobs
+            "committed_shipping_date": parse_date(shipping_date_text) if shipping_date_text else datetime.utcnow(),
+            "print_jobs": [
+                {"job_type": job_type, "total_print_length": total_print_length, "gang_sheets": gang_sheets}
+                for job_type, total_print_length, gang_sheets in print_jobs
+            ]
         }
 
     async def monitor_emails(self):
@@ -526,7 +713,9 @@ class EmailProcessor:
             
         EMAIL = email_config.email_address
         PASSWORD = email_config.email_password
-        ALLOWED_SENDER = email_config.allowed_senders.split(',')[0] if email_config.allowed_senders else None
+        ALLOWED_SENDERS = frozenset(
+            addr.strip().lower() for addr in (email_config.allowed_senders or "").split(',') if addr.strip()
+        )
         POLL_INTERVAL = email_config.sleep_time
         
         # Get download path from email config and store as instance variable
@@ -543,60 +732,48 @@ class EmailProcessor:
             print(f"\n🔄 EmailProcessor.monitor_emails() started with is_running={self.is_running}")
             print("\n📧 Connecting to Gmail...")
             print(f"Checking inbox of: {EMAIL}")
-            print(f"Looking for emails from: {ALLOWED_SENDER}")
+            print(f"Looking for emails from: {', '.join(ALLOWED_SENDERS)}")
             
-            self.mail = imaplib.IMAP4_SSL("imap.gmail.com", 993, 
-                                        ssl_context=ssl.create_default_context())
-            self.mail.login(EMAIL, PASSWORD)
+            self.mail = await asyncio.to_thread(self.connect_imap, EMAIL, PASSWORD)
             print("✅ Login successful!")
             self.log_to_db("Email Connection", "success")
 
             while self.is_running:
                 try:
                     # Re-select inbox each time to refresh connection
-                    self.mail.select("inbox")
+                    await asyncio.to_thread(self.mail.select, "inbox")
                     print("\n🔍 Checking for unread emails...")
 
                     # Search for unread emails
-                    status, messages = self.mail.search(None, 'UNSEEN')
+                    status, messages = await asyncio.to_thread(self.mail.uid, 'SEARCH', None, 'UNSEEN')
                     if status != 'OK':
                         print("⚠️ Failed to search emails, reconnecting...")
                         # Reconnect and try again
-                        self.mail = imaplib.IMAP4_SSL("imap.gmail.com", 993, 
-                                                    ssl_context=ssl.create_default_context())
-                        self.mail.login(EMAIL, PASSWORD)
-                        self.mail.select("inbox")
-                        status, messages = self.mail.search(None, 'UNSEEN')
+                        self.mail = await asyncio.to_thread(self.connect_imap, EMAIL, PASSWORD)
+                        await asyncio.to_thread(self.mail.select, "inbox")
+                        status, messages = await asyncio.to_thread(self.mail.uid, 'SEARCH', None, 'UNSEEN')
                     
                     email_ids = messages[0].split()
 
                     if email_ids:
                         print(f"📩 Found {len(email_ids)} unread emails")
-                        for e_id in email_ids:
-                            try:
-                                status, msg_data = self.mail.fetch(e_id, '(RFC822)')
-                                if status != 'OK':
-                                    print(f"⚠️ Failed to fetch email {e_id}, skipping...")
-                                    continue
-                                    
-                                email_body = msg_data[0][1]
-                                email_message = email.message_from_bytes(email_body)
-                            except Exception as e:
-                                print(f"❌ Error fetching email {e_id}: {str(e)}")
+                        for e_id, email_message in await asyncio.to_thread(self.fetch_messages, email_ids):
+                            # Gate on the sender before decoding or parsing anything else
+                            sender = email_message['from'] or ""
+                            sender_lower = sender.lower()
+                            if not any(allowed in sender_lower for allowed in ALLOWED_SENDERS):
+                                print(f"❌ Sender not allowed! Expected one of: {', '.join(ALLOWED_SENDERS)}, Got: {sender}")
                                 continue
 
-                        sender = email_message['from']
-                        recipient = email_message['to']
-                        subject = decode_email_subject(email_message['subject'])
-
-                        print(f"\n📨 Email Details:")
-                        print(f"From: {sender}")
-                        print(f"To: {recipient}")
-                        print(f"Subject: {subject}")
+                            recipient = email_message['to']
+                            subject = decode_email_subject(email_message['subject'])
 
-                        if ALLOWED_SENDER in sender:
+                            print(f"\n📨 Email Details:")
+                            print(f"From: {sender}")
+                            print(f"To: {recipient}")
+                            print(f"Subject: {subject}")
                             print("✅ Sender is in allowed list!")
-                            body = get_email_body(email_message)
+                            body, html_body = extract_bodies(email_message)
                             print("\n📝 Email Body:")
                             print(body if body else "(No plain text body found)")
 
@@ -608,17 +785,6 @@ class EmailProcessor:
                                 print(f"Order Type: {order_details['order_type']}")
                                 print(f"Customer: {order_details['customer_name']}")
 
-                                # Check if order with this PO number already exists
-                                existing_order = self.db.query(Order).filter(Order.po_number == order_details['po_number']).first()
-                                
-                                if existing_order:
-                                    print(f"⚠️ Order with PO number {order_details['po_number']} already exists (ID: {existing_order.id}). Updating folder path.")
-                                    # Update the existing order's folder path to use the new download path
-                                    existing_order.folder_path = os.path.join(self.download_path, f"Order_{order_details['po_number']}")
-                                    self.db.commit()
-                                    order = existing_order
-                                    continue
-
                                 # Create folder using cached download path
                                 sanitized_customer_name = sanitize_folder_name(order_details['customer_name'])
                                 folder_path = os.path.join(self.download_path, f"Order_{order_details['po_number']}")
@@ -637,61 +803,72 @@ class EmailProcessor:
                                     status="processing",
                                     folder_path=folder_path
                                 )
-                                
+                            
                                 # Override folder_path to ensure it uses the new download path
                                 order.folder_path = folder_path
-                                print("💾 Saving order to database...")
+                                print("💾 Saving order and print jobs to database...")
                                 try:
                                     self.db.add(order)
-                                    self.db.commit()
-                                    print("✅ Order saved successfully")
+                                    # Flush to get order.id; the order and its print jobs commit together
+                                    self.db.flush()
                                 except IntegrityError as e:
+                                    # The unique po_number constraint catches resent orders without a lookup first
                                     self.db.rollback()
-                                    print(f"⚠️ Order with PO number {order_details['po_number']} already exists (database constraint). Skipping duplicate.")
+                                    print(f"⚠️ Order with PO number {order_details['po_number']} already exists. Updating folder path.")
+                                    # Update the existing order's folder path to use the new download path
+                                    self.db.query(Order).filter(Order.po_number == order_details['po_number']).update(
+                                        {Order.folder_path: folder_path}, synchronize_session=False
+                                    )
+                                    self.db.commit()
                                     continue
-                                
-                                # Broadcast new order via WebSocket
-                                await self.broadcast_new_order(order)
 
-                                # Save print jobs
-                                for job in order_details['print_jobs']:
-                                    print_job = PrintJob(
+                                self.db.add_all([
+                                    PrintJob(
                                         order_id=order.id,
                                         job_type=job['job_type'],
                                         total_print_length=job['total_print_length'],
                                         gang_sheets=job['gang_sheets'],
                                         status="pending"
                                     )
-                                    self.db.add(print_job)
-                                print("💾 Saving print jobs...")
+                                    for job in order_details['print_jobs']
+                                ])
                                 self.db.commit()
-                                print("✅ Print jobs saved successfully")
+                                print("✅ Order and print jobs saved successfully")
+
+                                # Broadcast new order via WebSocket
+                                await self.broadcast_new_order(order)
 
                                 # Process attachments
+                                self.pending_prints = []
                                 await self.process_attachments(email_message, order)
-                                
+                            
                                 # Process download URLs from email body
-                                await self.process_download_urls(email_message, order)
-                                
+                                await self.process_download_urls(html_body, order)
+                            
                                 # Create email body PDF
                                 await self.create_email_body_pdf(email_message, order, body)
-                                
-                                # Update order status
+                            
+                                # Update order status; this also commits the attachment records above
                                 order.status = "completed"
                                 self.db.commit()
                                 print(f"✅ Order {order_details['po_number']} processed successfully")
                                 
-                                
+                                # Queue printing only now, so the workers see committed rows
+                                # to record print_status on (one printer run per printer)
+                                self.printer_service.enqueue_files(self.pending_prints)
+                                self.pending_prints = []
+                            
+                            
                                 # Broadcast order completion via WebSocket
                                 await self.broadcast_order_update(order)
 
                             except Exception as e:
+                                self.db.rollback()
+                                self.pending_prints = []
                                 print(f"❌ Error processing order: {str(e)}")
                                 self.log_to_db("Order Processing", "failed", str(e))
                                 continue
 
-                        else:
-                            print(f"❌ Sender not allowed! Expected: {ALLOWED_SENDER}, Got: {sender}")
                     else:
                         print("📭 No unread emails found")
 
@@ -701,9 +878,7 @@ class EmailProcessor:
                 except imaplib.IMAP4.error as e:
                     print(f"⚠️ IMAP error: {str(e)}, reconnecting...")
                     try:
-                        self.mail = imaplib.IMAP4_SSL("imap.gmail.com", 993, 
-                                                    ssl_context=ssl.create_default_context())
-                        self.mail.login(EMAIL, PASSWORD)
+                        self.mail = await asyncio.to_thread(self.connect_imap, EMAIL, PASSWORD)
                     except Exception as e:
                         print(f"❌ Failed to reconnect: {str(e)}")
                         await asyncio.sleep(POLL_INTERVAL)
@@ -720,174 +895,254 @@ class EmailProcessor:
         
     
 
+    def connect_imap(self, email_address: str, password: str) -> imaplib.IMAP4_SSL:
+        """Open and log in an IMAP session to Gmail (blocking; run it in a thread)"""
+        mail = imaplib.IMAP4_SSL("imap.gmail.com", 993, ssl_context=IMAP_SSL_CONTEXT)
+        mail.login(email_address, password)
+        return mail
+
+    def fetch_messages(self, uids: List[bytes]) -> List[Tuple[bytes, email.message.Message]]:
+        """Fetch the given messages by UID in a single FETCH round-trip (blocking)"""
+        try:
+            status, msg_data = self.mail.uid('FETCH', b','.join(uids), '(RFC822)')
+        except Exception as e:
+            print(f"❌ Error fetching {len(uids)} emails: {str(e)}")
+            return []
+        if status != 'OK':
+            print(f"⚠️ Failed to fetch {len(uids)} emails, skipping...")
+            return []
+        
+        # Responses alternate between (header, body) tuples and closing b')' markers
+        messages = []
+        for item in msg_data:
+            if isinstance(item, tuple):
+                uid_match = FETCH_UID_RE.search(item[0])
+                uid = uid_match.group(1) if uid_match else b''
+                messages.append((uid, email.message_from_bytes(item[1])))
+        return messages
+
     async def process_attachments(self, email_msg: email.message.Message, order: Order):
         # Force the order to use the new download path, ignore database value
         order.folder_path = os.path.join(self.download_path, f"Order_{order.po_number}")
         os.makedirs(order.folder_path, exist_ok=True)
         
-        for part in email_msg.walk():
-            if part.get_content_disposition() == 'attachment':
-                filename = part.get_filename()
-                if filename:
-                    # Use current download path instead of stored folder_path
-                    order_folder = os.path.join(self.download_path, f"Order_{order.po_number}")
-                    os.makedirs(order_folder, exist_ok=True)
-                    original_file_path = os.path.join(order_folder, filename)
-                    print(f"\n📎 Processing attachment: {filename}")
-                    
-                    # Save original file
-                    with open(original_file_path, 'wb') as f:
-                        f.write(part.get_payload(decode=True))
-                    print(f"✅ Saved original file: {original_file_path}")
+        attachment_parts = [
+            (part, part.get_filename()) for part in email_msg.walk()
+            if part.get_content_disposition() == 'attachment' and part.get_filename()
+        ]
+        if not attachment_parts:
+            return
+        
+        # Use current download path instead of stored folder_path
+        order_folder = os.path.join(self.download_path, f"Order_{order.po_number}")
+        os.makedirs(order_folder, exist_ok=True)
+        
+        # Give every part its own path before writing concurrently: the first part with a
+        # name overwrites as before, repeats of a name in this email get name_1.ext, ...
+        claimed_paths = set()
+        part_paths = []
+        for _, filename in attachment_parts:
+            file_path = os.path.join(order_folder, filename)
+            while file_path in claimed_paths:
+                file_path = reserve_unique_path(order_folder, filename)
+            claimed_paths.add(file_path)
+            part_paths.append(file_path)
+        
+        # Decode and write the attachments concurrently, a few at a time to bound memory
+        semaphore = asyncio.Semaphore(ATTACHMENT_SAVE_CONCURRENCY)
+        
+        async def save_part(part: email.message.Message, filename: str, original_file_path: str) -> str:
+            async with semaphore:
+                logger.info(f"📎 Processing attachment: {filename}")
+                async with aiofiles.open(original_file_path, 'wb') as f:
+                    await f.write(await asyncio.to_thread(part.get_payload, decode=True))
+                logger.info(f"✅ Saved original file: {original_file_path}")
+                return original_file_path
+        
+        saved_paths = await asyncio.gather(
+            *(
+                save_part(part, filename, file_path)
+                for (part, filename), file_path in zip(attachment_parts, part_paths)
+            ),
+            return_exceptions=True
+        )
+        
+        saved_attachments = []
+        for (part, filename), original_file_path in zip(attachment_parts, saved_paths):
+            if isinstance(original_file_path, Exception):
+                logger.error(f"❌ Failed to save attachment {filename}: {str(original_file_path)}")
+                self.log_to_db("Attachment Processing", "failed", str(original_file_path), order.id)
+                continue
 
-                    try:
-                        # Determine sheet type and number from filename
-                        sheet_type = None
-                        sheet_number = None
-                        # Check all supported order types
-                        for job_type in ORDER_TYPE_MAPPING.keys():
-                            if job_type in filename:
-                                sheet_type = f"{job_type} Gang Sheet"
-                                num_match = re.search(r"#(\d+)", filename)
-                                sheet_number = int(num_match.group(1)) if num_match else 1
-                                break
-
-                        # Keep files as-is, no PDF conversion for email attachments
-                        pdf_file_path = None
-                        file_extension = filename.split('.')[-1].lower()
-                        
-                        if file_extension == 'pdf':
-                            # Already a PDF, use as-is
-                            pdf_file_path = original_file_path
-                            print(f"✅ File is already PDF format")
-                        else:
-                            # For non-PDF files, don't create PDF version
-                            pdf_file_path = None
-                            print(f"✅ Keeping file as-is: {original_file_path}")
-
-                        # Save attachment record
-                        attachment = Attachment(
-                            order_id=order.id,
-                            file_name=filename,
-                            file_path=original_file_path,  # Always store original file path
-                            pdf_path=pdf_file_path if pdf_file_path and pdf_file_path.endswith('.pdf') else None,
-                            file_type=file_extension,
-                            print_status="pending",
-                            sheet_type=sheet_type,
-                            sheet_number=sheet_number
-                        )
-                        self.db.add(attachment)
-                        self.db.commit()
-                        print(f"✅ Attachment record saved to database")
-
-                        # Print attachment
-                        await self.printer_service.print_file(attachment)
-                        
-                        # Auto-download attachment if enabled
-                        if file_downloader.is_auto_download_enabled():
-                            await file_downloader.download_attachment(attachment)
-                        
-                    except Exception as e:
-                        print(f"❌ Failed to process attachment: {str(e)}")
-                        self.log_to_db("Attachment Processing", "failed", str(e), order.id)
+            try:
+                # Determine sheet type and number from filename
+                sheet_type, sheet_number = detect_sheet_from_filename(filename)
+
+                # Keep files as-is, no PDF conversion for email attachments
+                pdf_file_path = None
+                file_extension = filename.split('.')[-1].lower()
+                
+                if file_extension == 'pdf':
+                    # Already a PDF, use as-is
+                    pdf_file_path = original_file_path
+                    logger.info(f"✅ File is already PDF format")
+                else:
+                    # For non-PDF files, don't create PDF version
+                    pdf_file_path = None
+                    logger.info(f"✅ Keeping file as-is: {original_file_path}")
+
+                # Save attachment record
+                attachment = Attachment(
+                    order_id=order.id,
+                    file_name=filename,
+                    file_path=original_file_path,  # Always store original file path
+                    pdf_path=pdf_file_path if pdf_file_path and pdf_file_path.endswith('.pdf') else None,
+                    file_type=file_extension,
+                    print_status="pending",
+                    sheet_type=sheet_type,
+                    sheet_number=sheet_number
+                )
+                saved_attachments.append(attachment)
+                
+            except Exception as e:
+                logger.error(f"❌ Failed to process attachment: {str(e)}")
+                self.log_to_db("Attachment Processing", "failed", str(e), order.id)
+
+        if not saved_attachments:
+            return
+
+        # Save all attachment records in one batch
+        self.db.add_all(saved_attachments)
+        self.db.flush()
+        logger.info(f"✅ {len(saved_attachments)} attachment record(s) saved to database")
 
-    async def process_download_urls(self, email_msg: email.message.Message, order: Order):
+        # Printed once the order commits (see monitor_emails)
+        self.pending_prints.extend(saved_attachments)
+
+        for attachment in saved_attachments:
+            try:
+                # Auto-download attachment if enabled
+                if file_downloader.is_auto_download_enabled():
+                    await file_downloader.download_attachment(attachment)
+            except Exception as e:
+                logger.error(f"❌ Failed to process attachment: {str(e)}")
+                self.log_to_db("Attachment Processing", "failed", str(e), order.id)
+
+    async def process_download_urls(self, html_body: Optional[str], order: Order):
         # Force the order to use the new download path, ignore database value
         order.folder_path = os.path.join(self.download_path, f"Order_{order.po_number}")
         os.makedirs(order.folder_path, exist_ok=True)
         """Process download URLs from email body HTML"""
         try:
-            # Extract HTML body
-            html_body = get_email_html_body(email_msg)
             if not html_body:
-                print("ℹ️ No HTML body found, skipping URL downloads")
+                logger.info("ℹ️ No HTML body found, skipping URL downloads")
                 return
             
             # Extract download URLs
             download_links = extract_download_urls_from_html(html_body)
             
             if not download_links:
-                print("ℹ️ No download links found in email")
+                logger.info("ℹ️ No download links found in email")
                 return
             
-            print(f"\n🔗 Found {len(download_links)} download link(s) in email")
+            logger.info(f"🔗 Found {len(download_links)} download link(s) in email")
+            
+            # Use current download path instead of stored folder_path
+            order_folder = os.path.join(self.download_path, f"Order_{order.po_number}")
+            os.makedirs(order_folder, exist_ok=True)
             
-            # Process each download link
+            # Work out every target file first so names stay unique while downloads run concurrently
+            planned_downloads = []
             for idx, link_info in enumerate(download_links, 1):
                 url = link_info['url']
                 link_text = link_info['link_text']
                 context = link_info['context']
                 
-                print(f"\n📥 Processing download {idx}/{len(download_links)}")
-                print(f"Link text: {link_text}")
-                print(f"URL: {url}")
+                logger.info(f"📥 Processing download {idx}/{len(download_links)} - link text: {link_text}, URL: {url}")
                 
                 # Detect order type and sheet number from context
                 type_info = detect_order_type_from_context(context, link_text)
+                if not type_info:
+                    logger.warning(f"⚠️ Could not detect order type from context, skipping download. Context: {context[:200]}...")
+                    continue
                 
-                if type_info:
-                    order_type, sheet_number = type_info
-                    print(f"Detected: {order_type} Gang Sheet #{sheet_number}")
-                    
-                    # Generate filename
-                    internal_type = ORDER_TYPE_MAPPING.get(order_type, "unknown")
-                    base_filename = get_filename_from_url(url, f"{internal_type}_sheet_{sheet_number}")
-                    
-                    # Ensure unique filename
-                    # Use current download path instead of stored folder_path
-                    order_folder = os.path.join(self.download_path, f"Order_{order.po_number}")
-                    os.makedirs(order_folder, exist_ok=True)
-                    file_path = os.path.join(order_folder, base_filename)
-                    counter = 1
-                    while os.path.exists(file_path):
-                        name, ext = os.path.splitext(base_filename)
-                        file_path = os.path.join(order_folder, f"{name}_{counter}{ext}")
-                        counter += 1
+                order_type, sheet_number = type_info
+                logger.info(f"Detected: {order_type} Gang Sheet #{sheet_number}")
+                
+                # Generate filename
+                internal_type = ORDER_TYPE_MAPPING.get(order_type, "unknown")
+                base_filename = get_filename_from_url(url, f"{internal_type}_sheet_{sheet_number}")
+                
+                # Ensure unique filename
+                file_path = reserve_unique_path(order_folder, base_filename)
+                planned_downloads.append((url, file_path, base_filename, order_type, sheet_number))
+            
+            # Download the files concurrently
+            semaphore = asyncio.Semaphore(URL_DOWNLOAD_CONCURRENCY)
+            
+            async def fetch(url: str, file_path: str) -> bool:
+                async with semaphore:
+                    return await download_file_from_url(url, file_path)
+            
+            results = await asyncio.gather(
+                *(fetch(url, file_path) for url, file_path, *_ in planned_downloads)
+            )
+            
+            # Give back the names reserved for downloads that failed
+            for (url, file_path, *_), downloaded in zip(planned_downloads, results):
+                if not downloaded:
+                    try:
+                        os.remove(file_path)
+                    except OSError:
+                        pass
+            
+            # Record the results in link order, then print and auto-download them
+            saved_attachments = []
+            for (url, file_path, base_filename, order_type, sheet_number), downloaded in zip(planned_downloads, results):
+                if downloaded:
+                    # Determine file type
+                    file_extension = base_filename.split('.')[-1].lower()
                     
-                    # Download the file
-                    if await download_file_from_url(url, file_path):
-                        # Determine file type
-                        file_extension = base_filename.split('.')[-1].lower()
-                        
-                        # Keep files as-is, no PDF conversion for downloaded images
-                        pdf_file_path = None
-                        if file_extension == 'pdf':
-                            pdf_file_path = file_path
-                        else:
-                            # For non-PDF files, don't create PDF version
-                            pdf_file_path = None
-                            print(f"✅ Downloaded file as-is: {file_path}")
-                        
-                        # Save attachment record
-                        attachment = Attachment(
-                            order_id=order.id,
-                            file_name=os.path.basename(file_path),
-                            file_path=file_path,
-                            pdf_path=pdf_file_path if pdf_file_path and pdf_file_path.endswith('.pdf') else None,
-                            file_type=file_extension,
-                            print_status="pending",
-                            sheet_type=f"{order_type} Gang Sheet",
-                            sheet_number=sheet_number
-                        )
-                        self.db.add(attachment)
-                        self.db.commit()
-                        print(f"✅ Download saved to database")
-                        
-                        # Print the downloaded file
-                        await self.printer_service.print_file(attachment)
-                        
-                        # Auto-download attachment if enabled
-                        if file_downloader.is_auto_download_enabled():
-                            await file_downloader.download_attachment(attachment)
+                    # Keep files as-is, no PDF conversion for downloaded images
+                    pdf_file_path = None
+                    if file_extension == 'pdf':
+                        pdf_file_path = file_path
                     else:
-                        print(f"❌ Failed to download file from URL")
-                        self.log_to_db("URL Download", "failed", f"Failed to download: {url}", order.id)
+                        # For non-PDF files, don't create PDF version
+                        pdf_file_path = None
+                        logger.info(f"✅ Downloaded file as-is: {file_path}")
+                    
+                    # Save attachment record
+                    attachment = Attachment(
+                        order_id=order.id,
+                        file_name=os.path.basename(file_path),
+                        file_path=file_path,
+                        pdf_path=pdf_file_path if pdf_file_path and pdf_file_path.endswith('.pdf') else None,
+                        file_type=file_extension,
+                        print_status="pending",
+                        sheet_type=f"{order_type} Gang Sheet",
+                        sheet_number=sheet_number
+                    )
+                    saved_attachments.append(attachment)
                 else:
-                    print(f"⚠️ Could not detect order type from context, skipping download")
-                    print(f"Context: {context[:200]}...")
+                    logger.error(f"❌ Failed to download file from URL")
+                    self.log_to_db("URL Download", "failed", f"Failed to download: {url}", order.id)
+            
+            if saved_attachments:
+                self.db.add_all(saved_attachments)
+                self.db.flush()
+                logger.info(f"✅ {len(saved_attachments)} download(s) saved to database")
+            
+                # Printed once the order commits (see monitor_emails)
+                self.pending_prints.extend(saved_attachments)
+            
+            for attachment in saved_attachments:
+                # Auto-download attachment if enabled
+                if file_downloader.is_auto_download_enabled():
+                    await file_downloader.download_attachment(attachment)
                     
         except Exception as e:
-            print(f"❌ Error processing download URLs: {str(e)}")
+            logger.error(f"❌ Error processing download URLs: {str(e)}")
             self.log_to_db("URL Processing", "failed", str(e), order.id)
 
     async def create_email_body_pdf(self, email_msg: email.message.Message, order: Order, email_body: str):
@@ -929,33 +1184,26 @@ class EmailProcessor:
             
             """
             
-            # Save HTML file
-            html_filename = f"{order.po_number}_email_body.html"
-            # Use current download path instead of stored folder_path
-            order_folder = os.path.join(self.download_path, f"Order_{order.po_number}")
-            os.makedirs(order_folder, exist_ok=True)
-            html_file_path = os.path.join(order_folder, html_filename)
-            
-            with open(html_file_path, 'w', encoding='utf-8') as f:
-                f.write(html_content)
-            print(f"📄 Created HTML file: {html_file_path}")
+            # order.folder_path was pointed at the current download path and created above
+            order_folder = order.folder_path
             
             # Convert HTML to PDF
             pdf_filename = f"{order.po_number}_email_body.pdf"
             pdf_file_path = os.path.join(order_folder, pdf_filename)
             
-            print(f"🔄 Converting email body to PDF: {pdf_file_path}")
+            logger.info(f"🔄 Converting email body to PDF: {pdf_file_path}")
             
-            # Try wkhtmltopdf first, fallback to simple PDF
-            if convert_html_to_pdf(html_file_path, pdf_file_path):
-                print(f"✅ Email body PDF created successfully")
+            # Try wkhtmltopdf first, fallback to simple PDF; both block, so run them in a thread
+            # The HTML goes to wkhtmltopdf on stdin, so no intermediate .html file is written
+            if await asyncio.to_thread(convert_html_string_to_pdf, html_content, pdf_file_path):
+                logger.info(f"✅ Email body PDF created successfully")
             else:
                 # Fallback: create simple PDF with ReportLab
-                print(f"⚠️ wkhtmltopdf failed, using ReportLab fallback")
-                if convert_html_to_letter_pdf(email_body, pdf_file_path):
-                    print(f"✅ Email body PDF created with ReportLab")
+                logger.warning(f"⚠️ wkhtmltopdf failed, using ReportLab fallback")
+                if await asyncio.to_thread(convert_html_to_letter_pdf, email_body, pdf_file_path):
+                    logger.info(f"✅ Email body PDF created with ReportLab")
                 else:
-                    print(f"❌ Failed to create email body PDF")
+                    logger.error(f"❌ Failed to create email body PDF")
                     return
             
             # Save email body attachment record
@@ -969,45 +1217,50 @@ class EmailProcessor:
                 sheet_number=1
             )
             self.db.add(email_attachment)
-            self.db.commit()
-            print(f"✅ Email body PDF record saved to database")
+            self.db.flush()
+            logger.info(f"✅ Email body PDF record saved to database")
             
-            # Print email body PDF
-            await self.printer_service.print_file(email_attachment)
+            # Printed once the order commits (see monitor_emails)
+            self.pending_prints.append(email_attachment)
             
             # Auto-download email body PDF if enabled
             if file_downloader.is_auto_download_enabled():
                 await file_downloader.download_attachment(email_attachment)
             
         except Exception as e:
-            print(f"❌ Failed to create email body PDF: {str(e)}")
+            logger.error(f"❌ Failed to create email body PDF: {str(e)}")
             self.log_to_db("Email Body PDF Creation", "failed", str(e), order.id)
 
     async def start_processing(self):
         print("🔄 EmailProcessor.start_processing() called")
-        self.is_running = True
+        self._running.set()
         print(f"✅ EmailProcessor.is_running set to {self.is_running}")
         await self.monitor_emails()
 
     def stop_processing(self):
         print("🛑 Stopping email processing service...")
-        self.is_running = False
+        self._running.clear()
+
+    @staticmethod
+    def _order_payload(order: Order) -> Dict:
+        """WebSocket payload for an order, shared by the new-order and update broadcasts"""
+        return {
+            "id": order.id,
+            "po_number": order.po_number,
+            "order_type": order.order_type,
+            "customer_name": order.customer_name,
+            "delivery_address": order.delivery_address,
+            # Datetimes are serialized to ISO 8601 by the WebSocket manager
+            "committed_shipping_date": order.committed_shipping_date,
+            "processed_time": order.processed_time,
+            "status": order.status,
+            "folder_path": order.folder_path
+        }
 
     async def broadcast_new_order(self, order: Order):
         """Broadcast a new order to all connected WebSocket clients"""
         try:
-            order_data = {
-                "id": order.id,
-                "po_number": order.po_number,
-                "order_type": order.order_type,
-                "customer_name": order.customer_name,
-                "delivery_address": order.delivery_address,
-                "committed_shipping_date": order.committed_shipping_date.isoformat() if order.committed_shipping_date else None,
-                "processed_time": order.processed_time.isoformat() if order.processed_time else None,
-                "status": order.status,
-                "folder_path": order.folder_path
-            }
-            await manager.broadcast_order_update(order_data)
+            await manager.broadcast_order_update(self._order_payload(order))
             print(f"📡 Broadcasted new order: {order.po_number}")
         except Exception as e:
             print(f"❌ Failed to broadcast new order: {str(e)}")
@@ -1015,18 +1268,7 @@ class EmailProcessor:
     async def broadcast_order_update(self, order: Order):
         """Broadcast an order update to all connected WebSocket clients"""
         try:
-            order_data = {
-                "id": order.id,
-                "po_number": order.po_number,
-                "order_type": order.order_type,
-                "customer_name": order.customer_name,
-                "delivery_address": order.delivery_address,
-                "committed_shipping_date": order.committed_shipping_date.isoformat() if order.committed_shipping_date else None,
-                "processed_time": order.processed_time.isoformat() if order.processed_time else None,
-                "status": order.status,
-                "folder_path": order.folder_path
-            }
-            await manager.broadcast_order_update(order_data)
+            await manager.broadcast_order_update(self._order_payload(order))
             print(f"📡 Broadcasted order update: {order.po_number} - {order.status}")
         except Exception as e:
             print(f"❌ Failed to broadcast order update: {str(e)}")
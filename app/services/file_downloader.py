@@ -1,32 +1,100 @@
 import os
 import shutil
 import asyncio
+import logging
+import time
+from collections import OrderedDict
 from pathlib import Path
 from typing import Optional
+from sqlalchemy.orm import joinedload
 from app.models.order import Attachment, EmailConfig as EmailConfigModel
 from app.db.session import SessionLocal
 
+logger = logging.getLogger(__name__)
+
+# Seconds the auto-download settings are reused before EmailConfig is read again
+CONFIG_CACHE_TTL = 30
+
+# Order download directories remembered as already created (least recently used dropped first)
+KNOWN_DIRS_LIMIT = 1024
+
+# Linux ioctl that clones a file's extents copy-on-write (btrfs, XFS); fcntl is POSIX-only
+FICLONE = 0x40049409
+if os.name == 'posix':
+    import fcntl
+else:
+    fcntl = None
+
+
+def fast_copy(source_path: Path, dest_path: Path):
+    """Copy a file like shutil.copy2, as a reflink clone where the filesystem supports it
+
+    shutil.copy2 already copies in-kernel (sendfile) on Linux, so it is the fallback.
+    """
+    if os.path.exists(dest_path) and os.path.samefile(source_path, dest_path):
+        # Opening dest for writing would truncate the source; fail the way copy2 does
+        raise shutil.SameFileError(f"{source_path} and {dest_path} are the same file")
+    if fcntl is not None:
+        try:
+            with open(source_path, 'rb') as src, open(dest_path, 'wb') as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            shutil.copystat(source_path, dest_path)
+            return
+        except OSError:
+            pass
+    shutil.copy2(source_path, dest_path)
+
 
 class FileDownloader:
     def __init__(self):
-        self.db = SessionLocal()
+        # No long-lived session: each lookup opens a short one, so an idle
+        # downloader holds no connection
+        self._config = None
+        self._config_loaded_at = float('-inf')
+        self._known_dirs = OrderedDict()
+    
+    async def _ensure_dir(self, directory: Path):
+        """Create directory once; later calls for a remembered directory skip the mkdir"""
+        key = str(directory)
+        if key in self._known_dirs:
+            self._known_dirs.move_to_end(key)
+            return
+        await asyncio.to_thread(directory.mkdir, parents=True, exist_ok=True)
+        self._known_dirs[key] = None
+        if len(self._known_dirs) > KNOWN_DIRS_LIMIT:
+            self._known_dirs.popitem(last=False)
+    
+    def _get_config(self):
+        """Auto-download settings (auto_download_enabled, download_path), re-read at most every CONFIG_CACHE_TTL seconds"""
+        now = time.monotonic()
+        if now - self._config_loaded_at >= CONFIG_CACHE_TTL:
+            with SessionLocal() as db:
+                self._config = db.query(
+                    EmailConfigModel.auto_download_enabled, EmailConfigModel.download_path
+                ).first()
+            self._config_loaded_at = now
+        return self._config
     
-    def __del__(self):
-        if hasattr(self, 'db'):
-            self.db.close()
+    def invalidate_config(self):
+        """Drop the cached settings so the next call re-reads EmailConfig"""
+        self._config_loaded_at = float('-inf')
     
-    async def download_attachment(self, attachment: Attachment) -> bool:
-        """Download an attachment to the configured download path"""
+    async def download_attachment(self, attachment: Attachment, email_config=None) -> bool:
+        """Download an attachment to the configured download path
+
+        email_config: settings already fetched by the caller; looked up when omitted
+        """
         try:
             # Get email config
-            email_config = self.db.query(EmailConfigModel).first()
+            if email_config is None:
+                email_config = self._get_config()
             
             if not email_config or not email_config.auto_download_enabled:
-                print("Auto-download is disabled or not configured")
+                logger.info("Auto-download is disabled or not configured")
                 return False
             
             if not email_config.download_path:
-                print("Download path is not configured")
+                logger.warning("Download path is not configured")
                 return False
             
             # Use the configured download path directly
@@ -34,58 +102,70 @@ class FileDownloader:
             download_dir = Path(email_config.download_path)
             
             # Log the configured path for reference
-            print(f"📁 Configured download path: {email_config.download_path}")
-            print(f"📁 Download directory: {download_dir}")
-            
-            # Create the download directory
-            download_dir.mkdir(parents=True, exist_ok=True)
+            logger.info(f"📁 Configured download path: {email_config.download_path} (directory: {download_dir})")
             
-            # Create subdirectory for this order
+            # Create the download directory and the subdirectory for this order (off the event loop)
             order_dir = download_dir / f"Order_{attachment.order.po_number}"
-            order_dir.mkdir(exist_ok=True)
+            await self._ensure_dir(order_dir)
             
             # Source file path
             source_path = Path(attachment.file_path)
             
-            if not source_path.exists():
-                print(f"Source file does not exist: {source_path}")
+            if not await asyncio.to_thread(source_path.exists):
+                logger.warning(f"Source file does not exist: {source_path}")
                 return False
             
             # Destination file path
             dest_path = order_dir / attachment.file_name
             
-            # Copy file directly to the configured path
-            shutil.copy2(source_path, dest_path)
+            # Copy file directly to the configured path, off the event loop
+            try:
+                await asyncio.to_thread(fast_copy, source_path, dest_path)
+            except FileNotFoundError:
+                # The order directory was removed since we created it; recreate and retry
+                self._known_dirs.pop(str(order_dir), None)
+                await self._ensure_dir(order_dir)
+                await asyncio.to_thread(fast_copy, source_path, dest_path)
             
-            print(f"✅ Auto-downloaded: {attachment.file_name} to {dest_path}")
+            logger.info(f"✅ Auto-downloaded: {attachment.file_name} to {dest_path}")
             
             
             return True
             
         except Exception as e:
-            print(f"❌ Auto-download failed for {attachment.file_name}: {str(e)}")
+            logger.error(f"❌ Auto-download failed for {attachment.file_name}: {str(e)}")
             return False
     
     async def download_all_order_attachments(self, order_id: int) -> dict:
         """Download all attachments for an order"""
         try:
-            # Get all attachments for the order
-            attachments = self.db.query(Attachment).filter(Attachment.order_id == order_id).all()
+            # Check the settings once for the whole batch
+            email_config = self._get_config()
+            if not email_config or not email_config.auto_download_enabled or not email_config.download_path:
+                return {"success": False, "message": "Auto-download is disabled or not configured"}
+            
+            # Get all attachments for the order (with their order, which download_attachment reads)
+            with SessionLocal() as db:
+                attachments = (
+                    db.query(Attachment)
+                    .options(joinedload(Attachment.order))
+                    .filter(Attachment.order_id == order_id)
+                    .all()
+                )
             
             if not attachments:
                 return {"success": False, "message": "No attachments found for this order"}
             
-            results = []
-            success_count = 0
-            
-            for attachment in attachments:
-                success = await self.download_attachment(attachment)
-                results.append({
-                    "file_name": attachment.file_name,
-                    "success": success
-                })
-                if success:
-                    success_count += 1
+            # Copy the attachments concurrently
+            outcomes = await asyncio.gather(
+                *(self.download_attachment(attachment, email_config) for attachment in attachments),
+                return_exceptions=True
+            )
+            results = [
+                {"file_name": attachment.file_name, "success": outcome is True}
+                for attachment, outcome in zip(attachments, outcomes)
+            ]
+            success_count = sum(result["success"] for result in results)
             
             return {
                 "success": True,
@@ -99,7 +179,7 @@ class FileDownloader:
     def is_auto_download_enabled(self) -> bool:
         """Check if auto-download is enabled"""
         try:
-            email_config = self.db.query(EmailConfigModel).first()
+            email_config = self._get_config()
             return email_config and email_config.auto_download_enabled and email_config.download_path
         except:
             return False
@@ -107,7 +187,7 @@ class FileDownloader:
     def get_download_path(self) -> Optional[str]:
         """Get the configured download path"""
         try:
-            email_config = self.db.query(EmailConfigModel).first()
+            email_config = self._get_config()
             return email_config.download_path if email_config else None
         except:
             return None
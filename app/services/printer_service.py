@@ -1,9 +1,29 @@
 import os
+import re
 import subprocess
 import asyncio
+import logging
+from typing import List, Tuple
 from app.models.order import Attachment
+from app.db.session import SessionLocal
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
+PRINTABLE_TYPES = ('pdf', 'png', 'jpg', 'jpeg')
+LABEL_RE = re.compile('label', re.IGNORECASE)
+# SumatraPDF processes allowed at once; also the number of background print workers
+PRINT_CONCURRENCY = 2
+# Extra attempts when SumatraPDF fails to start, waiting PRINT_RETRY_DELAY * attempt seconds between them.
+# A run that started is never repeated: it may already have printed.
+PRINT_RETRIES = 2
+PRINT_RETRY_DELAY = 2
+# Seconds shutdown waits for queued jobs before stopping the workers
+PRINT_SHUTDOWN_TIMEOUT = 30
+
+# (attachment_id, file_path, file_type, file_name)
+PrintItem = Tuple[int, str, str, str]
+
 class PrinterService:
     def __init__(self):
         # Detect OS and set appropriate paths
@@ -15,61 +35,168 @@ class PrinterService:
             self.sumatra_path = "lib/sumatrapdf.exe"
             self.wkhtmltopdf_path = "lib/wkhtmltox/bin/wkhtmltopdf.exe"
             self.is_docker = False
+        # Fixed SumatraPDF arguments after the printer name
+        self._sumatra_print_args = ("-print-settings", "noscale")
+        
+        self._print_semaphore = asyncio.Semaphore(PRINT_CONCURRENCY)
+        # Queued (printer_name, PrintItem) jobs, one file each; workers start with the first job
+        self._queue = None
+        self._workers = []
+        # Jobs queued or being printed
+        self._unfinished_jobs = 0
 
     async def print_file(self, attachment: Attachment) -> bool:
+        """Print one attachment and wait for the result"""
         try:
-            file_path = attachment.file_path
             file_type = attachment.file_type.lower()
+            if file_type not in PRINTABLE_TYPES:
+                return False
             
-            if file_type in ['pdf', 'png', 'jpg', 'jpeg']:
-                # In Docker, simulate printing (no printer access)
-                if self.is_docker:
-                    print(f"🖨️ PRINT SIMULATION: Sending {file_path} to printer")
-                    print(f"   📄 File: {attachment.file_name}")
-                    print(f"   🏷️ Type: {file_type.upper()}")
-                    print(f"   📏 Size: {os.path.getsize(file_path) if os.path.exists(file_path) else 'Unknown'} bytes")
-                    print(f"   🖨️ Printer: {'Attachment Printer' if self.is_label_file(file_path) else 'Body Printer'}")
-                    print(f"   ✅ Print job simulated successfully!")
-                    return True  # Return True to not block processing
-                
-                printer_name = (settings.ATTACHMENT_PRINTER 
-                              if self.is_label_file(file_path) 
-                              else settings.BODY_PRINTER)
-                
-                return await self.print_with_sumatra(file_path, printer_name)
-            
-            return False
+            return await self._print_group(
+                self._printer_for(attachment.file_path),
+                [(attachment.id, attachment.file_path, file_type, attachment.file_name)]
+            )
         except Exception as e:
-            print(f"Print error: {str(e)}")
+            logger.error(f"❌ Print error: {str(e)}")
             return False
 
+    def enqueue_files(self, attachments: List[Attachment]):
+        """Queue committed attachments for background printing, one SumatraPDF run per file
+
+        Returns immediately; each attachment's print_status is set to printed or failed
+        once its job finishes, and stays pending if the app stops first.
+        """
+        jobs = [
+            (self._printer_for(attachment.file_path),
+             (attachment.id, attachment.file_path, attachment.file_type.lower(), attachment.file_name))
+            for attachment in attachments
+            if attachment.file_type.lower() in PRINTABLE_TYPES
+        ]
+        
+        if not jobs:
+            return
+        
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._workers = [asyncio.create_task(self._print_worker()) for _ in range(PRINT_CONCURRENCY)]
+        
+        for job in jobs:
+            self._queue.put_nowait(job)
+            self._unfinished_jobs += 1
+
+    async def shutdown(self):
+        """Give queued jobs up to PRINT_SHUTDOWN_TIMEOUT seconds to finish, then stop the workers"""
+        if self._queue is None:
+            return
+        
+        try:
+            await asyncio.wait_for(self._queue.join(), PRINT_SHUTDOWN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"⚠️ {self._unfinished_jobs} print job(s) unfinished at shutdown; their attachments stay pending"
+            )
+        
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._queue = None
+        self._workers = []
+
+    async def _print_worker(self):
+        """Print queued files and record each outcome on its attachment
+
+        Only a SumatraPDF that failed to start is retried; a run that exited with an
+        error may have printed the file already, so it is marked failed instead.
+        """
+        while True:
+            printer_name, item = await self._queue.get()
+            attachment_id, _, _, file_name = item
+            try:
+                printed = False
+                for attempt in range(PRINT_RETRIES + 1):
+                    try:
+                        printed = await self._print_group(printer_name, [item])
+                        break
+                    except OSError as e:
+                        logger.error(f"❌ Could not start SumatraPDF for {file_name}: {str(e)}")
+                    except Exception as e:
+                        logger.error(f"❌ Print error: {str(e)}")
+                        break
+                    if attempt < PRINT_RETRIES:
+                        await asyncio.sleep(PRINT_RETRY_DELAY * (attempt + 1))
+                
+                if not printed:
+                    logger.error(f"❌ Printing {file_name} to {printer_name} failed")
+                
+                await asyncio.to_thread(
+                    self._set_print_status, [attachment_id], "printed" if printed else "failed"
+                )
+            except Exception as e:
+                logger.error(f"❌ Failed to record print status: {str(e)}")
+            finally:
+                self._unfinished_jobs -= 1
+                self._queue.task_done()
+
+    def _set_print_status(self, attachment_ids: List[int], status: str):
+        with SessionLocal() as db:
+            db.query(Attachment).filter(Attachment.id.in_(attachment_ids)).update(
+                {Attachment.print_status: status}, synchronize_session=False
+            )
+            db.commit()
+
+    async def _print_group(self, printer_name: str, files: List[PrintItem]) -> bool:
+        """Send files that share a printer in a single SumatraPDF run
+
+        Raises OSError if SumatraPDF cannot be started.
+        """
+        # In Docker, simulate printing (no printer access)
+        if self.is_docker:
+            for _, file_path, file_type, file_name in files:
+                try:
+                    file_size = os.stat(file_path).st_size
+                except OSError:
+                    file_size = 'Unknown'
+                logger.info(f"🖨️ PRINT SIMULATION: Sending {file_path} to printer")
+                logger.info(f"   📄 File: {file_name}")
+                logger.info(f"   🏷️ Type: {file_type.upper()}")
+                logger.info(f"   📏 Size: {file_size} bytes")
+                logger.info(f"   🖨️ Printer: {'Attachment Printer' if self.is_label_file(file_path) else 'Body Printer'}")
+                logger.info(f"   ✅ Print job simulated successfully!")
+            return True  # Return True to not block processing
+        
+        async with self._print_semaphore:
+            return await self._run_sumatra([file_path for _, file_path, _, _ in files], printer_name)
+
+    def _printer_for(self, file_path: str) -> str:
+        return settings.ATTACHMENT_PRINTER if self.is_label_file(file_path) else settings.BODY_PRINTER
+
     def is_label_file(self, file_path: str) -> bool:
         # Implement logic to determine if file is a shipping label
         # This could be based on file name, size, or content
-        return "label" in file_path.lower()
+        return LABEL_RE.search(file_path) is not None
 
-    async def print_with_sumatra(self, file_path: str, printer_name: str) -> bool:
+    async def print_with_sumatra(self, file_paths: List[str], printer_name: str) -> bool:
+        """Send files to a printer; SumatraPDF prints every file named on its command line"""
         try:
-            command = [
-                self.sumatra_path,
-                "-print-to", printer_name,
-                "-print-settings", "noscale",
-                file_path
-            ]
-            
-            process = await asyncio.create_subprocess_exec(
-                *command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
-            )
-            
-            stdout, stderr = await process.communicate()
-            
-            return process.returncode == 0
+            return await self._run_sumatra(file_paths, printer_name)
         except Exception as e:
-            print(f"SumatraPDF error: {str(e)}")
+            logger.error(f"❌ SumatraPDF error: {str(e)}")
             return False
 
+    async def _run_sumatra(self, file_paths: List[str], printer_name: str) -> bool:
+        """Run SumatraPDF once; raises OSError if it cannot be started"""
+        command = [self.sumatra_path, "-print-to", printer_name, *self._sumatra_print_args, *file_paths]
+        
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        
+        stdout, stderr = await process.communicate()
+        
+        return process.returncode == 0
+
     async def convert_html_to_pdf(self, html_path: str, pdf_path: str) -> bool:
         try:
             command = [
@@ -92,5 +219,8 @@ class PrinterService:
             
             return process.returncode == 0
         except Exception as e:
-            print(f"wkhtmltopdf error: {str(e)}")
+            logger.error(f"❌ wkhtmltopdf error: {str(e)}")
             return False
+
+# Global instance
+printer_service = PrinterService()
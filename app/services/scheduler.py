@@ -1,7 +1,4 @@
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.interval import IntervalTrigger
-from apscheduler.jobstores.memory import MemoryJobStore
-from apscheduler.executors.asyncio import AsyncIOExecutor
+from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.services.email_processor import EmailProcessor
@@ -11,26 +8,17 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Seconds stop_processing waits for the current monitor cycle before cancelling it
+STOP_TIMEOUT = 10
+
 class EmailScheduler:
     def __init__(self):
-        # Configure job stores and executors
-        jobstores = {
-            'default': MemoryJobStore()
-        }
-        executors = {
-            'default': AsyncIOExecutor()
-        }
-        job_defaults = {
-            'coalesce': True,
-            'max_instances': 1,
-            'misfire_grace_time': 30
-        }
-        
-        self.scheduler = AsyncIOScheduler(
-            jobstores=jobstores,
-            executors=executors,
-            job_defaults=job_defaults
-        )
+        # A single asyncio task runs the monitor every sleep_time seconds; runs
+        # never overlap and a run that overshoots the interval is not repeated
+        self._task = None
+        self._stop = None
+        self._sleep_time = 5
+        self._next_run = None
         self.email_processor = None
         self.is_running = False
         
@@ -46,16 +34,11 @@ class EmailScheduler:
         db = next(get_db())
         self.email_processor = EmailProcessor(db)
         
-        # Add the email monitoring job
-        self.scheduler.add_job(
-            self._monitor_emails_job,
-            trigger=IntervalTrigger(seconds=sleep_time),
-            id='email_monitor',
-            name='Email Monitor',
-            replace_existing=True
-        )
-        
-        self.scheduler.start()
+        # Start the email monitoring loop
+        self._sleep_time = sleep_time
+        self._stop = asyncio.Event()
+        self._next_run = datetime.now() + timedelta(seconds=sleep_time)
+        self._task = asyncio.create_task(self._run_loop(self._stop))
         self.is_running = True
         
         # Broadcast status update
@@ -71,7 +54,23 @@ class EmailScheduler:
             
         logger.info("Stopping email processing scheduler")
         
-        self.scheduler.shutdown(wait=True)
+        # The loop exits instead of sleeping again, and the monitor leaves its polling
+        # loop after the current cycle; cancel it if that takes too long
+        self._stop.set()
+        if self.email_processor:
+            self.email_processor.stop_processing()
+        task = self._task
+        try:
+            await asyncio.wait_for(asyncio.shield(task), timeout=STOP_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"Email monitor still busy after {STOP_TIMEOUT}s, cancelling it")
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        if self.email_processor:
+            self.email_processor.db.close()
+            self.email_processor = None
+        self._task = None
+        self._next_run = None
         self.is_running = False
         
         # Broadcast status update
@@ -79,6 +78,23 @@ class EmailScheduler:
         
         logger.info("Email processing scheduler stopped")
         
+    async def _run_loop(self, stop: asyncio.Event):
+        """Run the monitor job every _sleep_time seconds until stop is set"""
+        loop = asyncio.get_running_loop()
+        next_run = loop.time() + self._sleep_time
+        while not stop.is_set():
+            self._next_run = datetime.now() + timedelta(seconds=max(0, next_run - loop.time()))
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=max(0, next_run - loop.time()))
+                break
+            except asyncio.TimeoutError:
+                pass
+            
+            started = loop.time()
+            await self._monitor_emails_job()
+            # Interval changes from update_interval apply from here on
+            next_run = started + self._sleep_time
+        
     async def _monitor_emails_job(self):
         """Job function that runs the email monitoring"""
         try:
@@ -101,30 +117,21 @@ class EmailScheduler:
         """Get current scheduler status"""
         return {
             "is_running": self.is_running,
-            "scheduler_running": self.scheduler.running if self.scheduler else False,
+            "scheduler_running": self._task is not None and not self._task.done(),
             "jobs": [
                 {
-                    "id": job.id,
-                    "name": job.name,
-                    "next_run": job.next_run_time.isoformat() if job.next_run_time else None
+                    "id": "email_monitor",
+                    "name": "Email Monitor",
+                    "next_run": self._next_run.isoformat() if self._next_run else None
                 }
-                for job in self.scheduler.get_jobs()
-            ] if self.scheduler else []
+            ] if self.is_running else []
         }
         
     def update_interval(self, sleep_time: int):
         """Update the monitoring interval"""
-        if self.is_running and self.scheduler:
-            # Remove existing job
-            self.scheduler.remove_job('email_monitor')
-            # Add new job with updated interval
-            self.scheduler.add_job(
-                self._monitor_emails_job,
-                trigger=IntervalTrigger(seconds=sleep_time),
-                id='email_monitor',
-                name='Email Monitor',
-                replace_existing=True
-            )
+        if self.is_running:
+            # Picked up by the loop after the current wait
+            self._sleep_time = sleep_time
             logger.info(f"Updated email monitoring interval to {sleep_time}s")
 
 # Global scheduler instance
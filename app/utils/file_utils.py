@@ -1,9 +1,25 @@
 import os
-import re
+import shutil
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Optional
 from urllib.parse import urlparse, parse_qs
 
+# Pooled session so repeated downloads from the same host reuse connections
+HTTP_SESSION = requests.Session()
+HTTP_ADAPTER = HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=64,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=(502, 503, 504))
+)
+HTTP_SESSION.mount('http://', HTTP_ADAPTER)
+HTTP_SESSION.mount('https://', HTTP_ADAPTER)
+COPY_CHUNK_SIZE = 1 << 20
+
+# Characters not allowed in file names, each replaced with '_'
+FILENAME_TRANSLATION = str.maketrans({c: '_' for c in '<>:"/\\|?*'})
+
 def create_folder(base_path: str, po_number: str, customer_name: str) -> str:
     """Creates a folder based on PO Number and customer name."""
     folder_name = f"{po_number}_{customer_name.replace(' ', '_')}"
@@ -13,12 +29,12 @@ def create_folder(base_path: str, po_number: str, customer_name: str) -> str:
 
 def sanitize_filename(filename: str) -> str:
     """Remove or replace invalid characters for file systems."""
-    return re.sub(r'[<>:"/\\|?*]', '_', filename)
+    return filename.translate(FILENAME_TRANSLATION)
 
 def save_attachment(url: str, folder_path: str, file_name: Optional[str] = None) -> Optional[str]:
     """Downloads an attachment from a URL and saves it to the specified folder."""
     try:
-        response = requests.get(url, stream=True)
+        response = HTTP_SESSION.get(url, stream=True)
         response.raise_for_status()
 
         if not file_name:
@@ -30,10 +46,10 @@ def save_attachment(url: str, folder_path: str, file_name: Optional[str] = None)
 
         os.makedirs(folder_path, exist_ok=True)
 
-        with open(file_path, 'wb') as file:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    file.write(chunk)
+        # Copy straight from the raw stream (still gzip-decoded) in 1 MiB chunks
+        with response, open(file_path, 'wb') as file:
+            response.raw.decode_content = True
+            shutil.copyfileobj(response.raw, file, length=COPY_CHUNK_SIZE)
 
         return file_path
     except Exception as e:
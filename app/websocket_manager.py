@@ -1,70 +1,78 @@
 from fastapi import WebSocket
-from typing import List
-import json
+from typing import Dict, Tuple
+import asyncio
+import logging
+from pydantic_core import to_json
+
+logger = logging.getLogger(__name__)
+
+# Pending messages kept per client before the oldest are dropped
+CLIENT_QUEUE_SIZE = 32
 
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        # Each client gets its own outgoing queue drained by a sender task, so a
+        # slow client only delays its own messages, never the broadcaster
+        self.active_connections: Dict[WebSocket, Tuple[asyncio.Queue, asyncio.Task]] = {}
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
-        print(f"🔌 WebSocket connected. Total connections: {len(self.active_connections)}")
+        queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+        task = asyncio.create_task(self._send_loop(websocket, queue))
+        self.active_connections[websocket] = (queue, task)
+        logger.info("🔌 WebSocket connected. Total connections: %d", len(self.active_connections))
+
+    def disconnect(self, websocket: WebSocket):
+        entry = self.active_connections.pop(websocket, None)
+        if entry:
+            entry[1].cancel()
+            logger.info("🔌 WebSocket disconnected. Total connections: %d", len(self.active_connections))
 
-    async def disconnect(self, websocket: WebSocket):
+    async def _send_loop(self, websocket: WebSocket, queue: asyncio.Queue):
         try:
-            if websocket in self.active_connections:
-                self.active_connections.remove(websocket)
-                print(f"🔌 WebSocket disconnected. Total connections: {len(self.active_connections)}")
-            
-            # Clean up any stale connections
-            stale_connections = []
-            for conn in self.active_connections:
-                try:
-                    # Try to ping the connection
-                    await conn.send_text('ping')
-                except:
-                    stale_connections.append(conn)
-            
-            # Remove stale connections
-            for conn in stale_connections:
-                if conn in self.active_connections:
-                    self.active_connections.remove(conn)
-                    print(f"🧹 Removed stale connection. Total connections: {len(self.active_connections)}")
-                    
+            while True:
+                message = await queue.get()
+                await websocket.send_text(message)
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            print(f"⚠️ Error during WebSocket disconnect: {str(e)}")
+            # Sending failed; drop the stale connection
+            self.active_connections.pop(websocket, None)
+            logger.info("🧹 Removed stale connection (%s). Total connections: %d", e, len(self.active_connections))
+
+    def _enqueue(self, queue: asyncio.Queue, message: str):
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Client is not keeping up; drop its oldest pending message
+            queue.get_nowait()
+            queue.put_nowait(message)
 
     async def send_personal_message(self, message: str, websocket: WebSocket):
-        await websocket.send_text(message)
+        entry = self.active_connections.get(websocket)
+        if entry:
+            self._enqueue(entry[0], message)
 
     async def broadcast(self, message: str):
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except:
-                # Mark for removal
-                disconnected.append(connection)
-        
-        # Remove disconnected connections
-        for connection in disconnected:
-            await self.disconnect(connection)
+        # Enqueueing never awaits, so connect/disconnect cannot run mid-loop; no copy needed
+        for queue, _ in self.active_connections.values():
+            self._enqueue(queue, message)
 
     async def broadcast_order_update(self, order_data: dict):
         """Broadcast a new order to all connected clients"""
-        message = json.dumps({
+        # Serialized once per broadcast (datetimes included), then queued for every client
+        message = to_json({
             "type": "new_order",
             "data": order_data
-        })
+        }).decode()
         await self.broadcast(message)
 
     async def broadcast_status_update(self, status_data: dict):
         """Broadcast processing status update to all connected clients"""
-        message = json.dumps({
-            "type": "status_update", 
+        message = to_json({
+            "type": "status_update",
             "data": status_data
-        })
+        }).decode()
         await self.broadcast(message)
 
 # Global WebSocket manager instance
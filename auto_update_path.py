@@ -4,6 +4,7 @@ Automatic script to update download path when frontend config changes
 This script monitors the database and updates Docker when the path changes
 """
 import os
+import select
 import subprocess
 import time
 import sys
@@ -12,8 +13,17 @@ from pathlib import Path
 # Add the app directory to the Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
 
-from app.db.session import SessionLocal
+from app.db.session import SessionLocal, engine
 from app.models.order import EmailConfig
+from migrations.add_email_config_notify import NOTIFY_CHANNEL
+from update_download_path import write_env_file
+
+# Polling (non-PostgreSQL) starts at POLL_INTERVAL seconds and backs off while
+# nothing changes; on PostgreSQL this is also how often LISTEN re-checks the DB
+POLL_INTERVAL = 5
+MAX_POLL_INTERVAL = 300
+# DOWNLOAD_PATH is already in os.environ, which the child process inherits
+RESTART_BACKEND_COMMAND = ['docker-compose', 'up', '-d', '--force-recreate', '--no-deps', 'backend']
 
 def get_current_download_path():
     """Get the current download path from database"""
@@ -39,22 +49,80 @@ def update_docker_path(new_path):
     
     # Create/update .env file
     env_content = f"DOWNLOAD_PATH={new_path}\n"
-    with open('.env', 'w') as f:
-        f.write(env_content)
-    
-    print(f"✅ Updated .env file with DOWNLOAD_PATH={new_path}")
+    if write_env_file(env_content):
+        print(f"✅ Updated .env file with DOWNLOAD_PATH={new_path}")
     
     # Restart Docker containers
     try:
         print("🔄 Restarting Docker containers...")
-        subprocess.run(['docker-compose', 'down'], check=True, capture_output=True)
-        subprocess.run(['docker-compose', 'up', '-d'], check=True, capture_output=True)
+        # Recreate only the backend in place; db, frontend and the network are left running
+        subprocess.run(RESTART_BACKEND_COMMAND, check=True, capture_output=True)
         print("✅ Docker containers restarted with new path")
         return True
     except subprocess.CalledProcessError as e:
         print(f"❌ Error restarting Docker: {e}")
         return False
 
+def apply_path_change(db_path, last_path):
+    """Update Docker if db_path differs from last_path; returns the path Docker now uses"""
+    if not db_path or db_path == last_path:
+        return last_path
+    
+    print(f"\n🔄 Path change detected!")
+    print(f"   Old path: {last_path}")
+    print(f"   New path: {db_path}")
+    
+    # Update Docker
+    if update_docker_path(db_path):
+        print(f"✅ Successfully updated to: {db_path}")
+        return db_path
+    print(f"❌ Failed to update to: {db_path}")
+    return last_path
+
+def listen_for_path_changes(last_path):
+    """Block on LISTEN until the email_config trigger reports a new download path"""
+    connection = engine.raw_connection()
+    try:
+        pg_connection = connection.driver_connection
+        pg_connection.autocommit = True
+        with pg_connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {NOTIFY_CHANNEL};")
+        
+        # Pick up anything that changed before we started listening
+        last_path = apply_path_change(get_current_download_path(), last_path)
+        
+        while True:
+            if select.select([pg_connection], [], [], MAX_POLL_INTERVAL) == ([], [], []):
+                # Nothing for a while; re-check in case the trigger migration hasn't run
+                last_path = apply_path_change(get_current_download_path(), last_path)
+                continue
+            
+            pg_connection.poll()
+            while pg_connection.notifies:
+                notification = pg_connection.notifies.pop(0)
+                last_path = apply_path_change(notification.payload, last_path)
+    finally:
+        connection.close()
+
+def poll_for_path_changes(last_path):
+    """Poll the database, backing off while the path stays the same"""
+    interval = POLL_INTERVAL
+    db = SessionLocal()
+    try:
+        while True:
+            row = db.query(EmailConfig.download_path).first()
+            # End the read transaction so the next poll sees new commits
+            db.rollback()
+            
+            db_path = row.download_path if row else None
+            changed = bool(db_path) and db_path != last_path
+            last_path = apply_path_change(db_path, last_path)
+            
+            interval = POLL_INTERVAL if changed else min(MAX_POLL_INTERVAL, interval * 1.5)
+            time.sleep(interval)
+    finally:
+        db.close()
+
 def monitor_path_changes():
     """Monitor database for download path changes"""
     print("🔍 Monitoring download path changes...")
@@ -64,24 +132,11 @@ def monitor_path_changes():
     print(f"📁 Current Docker path: {last_path}")
     
     try:
-        while True:
-            # Check database for path changes
-            db_path = get_current_download_path()
-            
-            if db_path and db_path != last_path:
-                print(f"\n🔄 Path change detected!")
-                print(f"   Old path: {last_path}")
-                print(f"   New path: {db_path}")
-                
-                # Update Docker
-                if update_docker_path(db_path):
-                    last_path = db_path
-                    print(f"✅ Successfully updated to: {db_path}")
-                else:
-                    print(f"❌ Failed to update to: {db_path}")
-            
-            # Wait 5 seconds before checking again
-            time.sleep(5)
+        if engine.dialect.name == 'postgresql':
+            # Woken by pg_notify from the trigger in migrations/add_email_config_notify.py
+            listen_for_path_changes(last_path)
+        else:
+            poll_for_path_changes(last_path)
             
     except KeyboardInterrupt:
         print("\n👋 Stopping path monitor...")
@@ -1,13 +1,24 @@
+import os
+from sqlalchemy import inspect
 from app.db.base import Base
 from app.db.session import engine
 from app.models.order import Order, Attachment, ProcessingLog, PrintJob, EmailConfig, PrinterConfig
 
 def init_db():
-    print("Creating database tables...")
-    # Drop all tables first to ensure clean state
-    Base.metadata.drop_all(bind=engine)
-    # Create all tables
-    Base.metadata.create_all(bind=engine)
+    # Dropping everything is opt-in so running this against a live database is safe
+    if os.environ.get("RESET_DB") == "1":
+        print("RESET_DB=1: dropping all tables...")
+        Base.metadata.drop_all(bind=engine)
+
+    existing_tables = set(inspect(engine).get_table_names())
+    missing_tables = [table for name, table in Base.metadata.tables.items() if name not in existing_tables]
+    if not missing_tables:
+        print("Database tables already exist, nothing to create")
+        return
+
+    print(f"Creating database tables: {', '.join(table.name for table in missing_tables)}...")
+    # create_all orders the tables by foreign key and runs in a single transaction
+    Base.metadata.create_all(bind=engine, tables=missing_tables, checkfirst=False)
     print("Database tables created successfully!")
 
 if __name__ == "__main__":
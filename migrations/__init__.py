@@ -0,0 +1,10 @@
+"""
+Database migrations; run them all with run_migrations.py or one with `python -m migrations.<name>`
+"""
+import sys
+from pathlib import Path
+
+# Make the project root importable once for every migration module
+PROJECT_ROOT = str(Path(__file__).resolve().parent.parent)
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
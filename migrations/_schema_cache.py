@@ -0,0 +1,23 @@
+"""
+Column lookups shared by the migration scripts, reflected once per process
+"""
+from sqlalchemy import inspect
+from app.db.session import engine
+
+_inspector = None
+_columns = {}
+
+def get_columns(table_name):
+    """Names of the columns in table_name, cached so repeated checks skip the catalog"""
+    global _inspector
+    if table_name not in _columns:
+        if _inspector is None:
+            _inspector = inspect(engine)
+        _columns[table_name] = frozenset(column['name'] for column in _inspector.get_columns(table_name))
+    return _columns[table_name]
+
+def invalidate_columns(table_name):
+    """Forget table_name's columns after altering it"""
+    _columns.pop(table_name, None)
+    if _inspector is not None:
+        _inspector.clear_cache()
@@ -1,34 +1,29 @@
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
-from app.core.config import settings
+from sqlalchemy import text
+from app.db.session import SessionLocal
+from migrations._schema_cache import get_columns
 
 if __name__ == "__main__":
-    DATABASE_URL = settings.SQLALCHEMY_DATABASE_URI
-    engine = create_engine(DATABASE_URL)
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
     with SessionLocal() as db:
         try:
             # Check if columns exist
-            from sqlalchemy.inspect import inspect
-            inspector = inspect(engine)
-            columns = [c['name'] for c in inspector.get_columns('email_config')]
+            columns = get_columns('email_config')
             
-            if 'auto_download_enabled' not in columns:
-                print("Adding auto_download_enabled column to email_config table...")
-                db.execute(text("ALTER TABLE email_config ADD COLUMN auto_download_enabled BOOLEAN DEFAULT FALSE"))
-                db.commit()
-                print("✅ auto_download_enabled column added successfully")
-            else:
-                print("auto_download_enabled column already exists")
+            # Add whichever columns are missing in one ALTER TABLE (one table lock)
+            new_columns = {
+                'auto_download_enabled': "BOOLEAN DEFAULT FALSE",
+                'download_path': "VARCHAR(500)",
+            }
+            missing = [name for name in new_columns if name not in columns]
+            for name in new_columns:
+                if name in columns:
+                    print(f"{name} column already exists")
             
-            if 'download_path' not in columns:
-                print("Adding download_path column to email_config table...")
-                db.execute(text("ALTER TABLE email_config ADD COLUMN download_path VARCHAR(500)"))
+            if missing:
+                print(f"Adding {', '.join(missing)} column(s) to email_config table...")
+                clauses = ", ".join(f"ADD COLUMN {name} {new_columns[name]}" for name in missing)
+                db.execute(text(f"ALTER TABLE email_config {clauses}"))
                 db.commit()
-                print("✅ download_path column added successfully")
-            else:
-                print("download_path column already exists")
+                print(f"✅ {', '.join(missing)} column(s) added successfully")
             
             print("✅ Migration completed successfully!")
             
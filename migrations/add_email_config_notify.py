@@ -0,0 +1,43 @@
+"""
+Migration script to notify listeners when the email config (download path) changes
+"""
+from app.db.session import engine
+from sqlalchemy import text
+
+# Channel auto_update_path.py LISTENs on; the payload is the new download_path
+NOTIFY_CHANNEL = 'email_config_changed'
+
+def run_migration():
+    print("🔄 Starting migration: Adding email_config change notifications...")
+    
+    if engine.dialect.name != 'postgresql':
+        print("ℹ️ Skipping email_config notify trigger (PostgreSQL only)")
+        return
+    
+    with engine.connect() as connection:
+        try:
+            connection.execute(text(f"""
+                CREATE OR REPLACE FUNCTION notify_email_config_changed() RETURNS trigger AS $$
+                BEGIN
+                    PERFORM pg_notify('{NOTIFY_CHANNEL}', COALESCE(NEW.download_path, ''));
+                    RETURN NEW;
+                END;
+                $$ LANGUAGE plpgsql;
+            """))
+            connection.execute(text("DROP TRIGGER IF EXISTS email_config_changed ON email_config;"))
+            connection.execute(text("""
+                CREATE TRIGGER email_config_changed
+                AFTER INSERT OR UPDATE OF download_path ON email_config
+                FOR EACH ROW EXECUTE PROCEDURE notify_email_config_changed();
+            """))
+            connection.commit()
+            print("✅ Successfully added email_config_changed trigger")
+            print("✅ Migration completed successfully!")
+            
+        except Exception as e:
+            print(f"❌ Error during migration: {str(e)}")
+            connection.rollback()
+            raise
+
+if __name__ == "__main__":
+    run_migration()
@@ -1,12 +1,9 @@
 """
 Migration script to add email_password column to email_config table
 """
-import sys
-import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 from app.db.session import engine
 from sqlalchemy import text
+from migrations._schema_cache import get_columns, invalidate_columns
 
 def run_migration():
     print("🔄 Starting migration: Adding email_password column to email_config table...")
@@ -14,13 +11,7 @@ def run_migration():
     with engine.connect() as connection:
         try:
             # Check if column exists
-            check_sql = text("""
-                SELECT column_name 
-                FROM information_schema.columns 
-                WHERE table_name = 'email_config' AND column_name = 'email_password';
-            """)
-            result = connection.execute(check_sql)
-            if not result.fetchone():
+            if 'email_password' not in get_columns('email_config'):
                 # Add the column if it doesn't exist
                 add_column_sql = text("""
                     ALTER TABLE email_config
@@ -28,6 +19,7 @@ def run_migration():
                 """)
                 connection.execute(add_column_sql)
                 connection.commit()
+                invalidate_columns('email_config')
                 print("✅ Successfully added email_password column")
             else:
                 print("ℹ️ email_password column already exists")
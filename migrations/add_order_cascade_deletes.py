@@ -0,0 +1,41 @@
+"""
+Migration script to add ON DELETE CASCADE to the foreign keys referencing orders
+"""
+from app.db.session import engine
+from sqlalchemy import inspect, text
+
+CHILD_TABLES = ['attachments', 'print_jobs', 'processing_logs']
+
+def run_migration():
+    print("🔄 Starting migration: Adding ON DELETE CASCADE to order foreign keys...")
+    
+    inspector = inspect(engine)
+    with engine.connect() as connection:
+        try:
+            for table in CHILD_TABLES:
+                for fk in inspector.get_foreign_keys(table):
+                    if fk['referred_table'] != 'orders':
+                        continue
+                    if (fk.get('options') or {}).get('ondelete', '').upper() == 'CASCADE':
+                        print(f"ℹ️ {table}.{fk['name']} already cascades")
+                        continue
+                    
+                    # Recreate the constraint with ON DELETE CASCADE
+                    connection.execute(text(f"ALTER TABLE {table} DROP CONSTRAINT {fk['name']}"))
+                    connection.execute(text(f"""
+                        ALTER TABLE {table}
+                        ADD CONSTRAINT {fk['name']} FOREIGN KEY (order_id)
+                        REFERENCES orders (id) ON DELETE CASCADE;
+                    """))
+                    print(f"✅ {table}.{fk['name']} now cascades on delete")
+            
+            connection.commit()
+            print("✅ Migration completed successfully!")
+            
+        except Exception as e:
+            print(f"❌ Error during migration: {str(e)}")
+            connection.rollback()
+            raise
+
+if __name__ == "__main__":
+    run_migration()
@@ -0,0 +1,51 @@
+"""
+Migration script to add indexes used by the orders list endpoints
+"""
+from app.db.session import engine
+from sqlalchemy import text
+
+CHILD_TABLES = ['attachments', 'print_jobs', 'processing_logs']
+
+def run_migration():
+    print("🔄 Starting migration: Adding indexes to orders table...")
+    
+    with engine.connect() as connection:
+        try:
+            # Superseded by the composite index below
+            connection.execute(text("DROP INDEX IF EXISTS ix_orders_processed_time_desc;"))
+            connection.execute(text("""
+                CREATE INDEX IF NOT EXISTS ix_orders_processed_time_id_desc
+                ON orders (processed_time DESC, id DESC);
+            """))
+            connection.commit()
+            print("✅ Successfully added ix_orders_processed_time_id_desc")
+            
+            # Child lookups by order_id (eager loading, cascaded deletes)
+            for table in CHILD_TABLES:
+                connection.execute(text(f"""
+                    CREATE INDEX IF NOT EXISTS ix_{table}_order_id
+                    ON {table} (order_id);
+                """))
+                print(f"✅ Successfully added ix_{table}_order_id")
+            
+            # Trigram index so the po_number ILIKE '%...%' search can use an index
+            if engine.dialect.name == 'postgresql':
+                connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm;"))
+                connection.execute(text("""
+                    CREATE INDEX IF NOT EXISTS ix_orders_po_number_trgm
+                    ON orders USING gin (po_number gin_trgm_ops);
+                """))
+                print("✅ Successfully added ix_orders_po_number_trgm")
+            else:
+                print("ℹ️ Skipping trigram index (PostgreSQL only)")
+            
+            connection.commit()
+            print("✅ Migration completed successfully!")
+            
+        except Exception as e:
+            print(f"❌ Error during migration: {str(e)}")
+            connection.rollback()
+            raise
+
+if __name__ == "__main__":
+    run_migration()
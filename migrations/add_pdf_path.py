@@ -1,26 +1,36 @@
 """
 Migration script to add pdf_path column to attachments table
 """
-import sys
 import os
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import re
 
 from app.db.session import engine
+from psycopg2.extras import execute_values
 from sqlalchemy import text
+from migrations._schema_cache import get_columns, invalidate_columns
 
-def run_migration():
-    print("🔄 Starting migration: Adding pdf_path column to attachments table...")
-    
+# Rows backfilled per committed UPDATE
+BACKFILL_BATCH_SIZE = int(os.getenv("PDF_PATH_BACKFILL_BATCH_SIZE", "5000"))
+IMAGE_TYPES = ('png', 'jpg', 'jpeg', 'gif', 'bmp')
+# Final extension, as matched by the old REGEXP_REPLACE(file_path, '\.[^.]+$', ...)
+EXTENSION_RE = re.compile(r'\.[^.]+\Z')
+
+def pdf_path_for(file_path, file_type):
+    """PDF an attachment prints from: the label PDF for images, the file itself for PDFs"""
+    if file_path is None:
+        return None
+    if file_type in IMAGE_TYPES:
+        return EXTENSION_RE.sub('_label.pdf', file_path, count=1)
+    if file_type == 'pdf':
+        return file_path
+    return None
+
+def add_column():
+    """Phase 1: add attachments.pdf_path if it is missing"""
     with engine.connect() as connection:
         try:
             # Check if column exists
-            check_sql = text("""
-                SELECT column_name 
-                FROM information_schema.columns 
-                WHERE table_name = 'attachments' AND column_name = 'pdf_path';
-            """)
-            result = connection.execute(check_sql)
-            if not result.fetchone():
+            if 'pdf_path' not in get_columns('attachments'):
                 # Add the column if it doesn't exist
                 add_column_sql = text("""
                     ALTER TABLE attachments
@@ -28,33 +38,67 @@ def run_migration():
                 """)
                 connection.execute(add_column_sql)
                 connection.commit()
+                invalidate_columns('attachments')
                 print("✅ Successfully added pdf_path column")
             else:
                 print("ℹ️ pdf_path column already exists")
+        except Exception as e:
+            print(f"❌ Error adding pdf_path column: {str(e)}")
+            connection.rollback()
+            raise
+
+def backfill_pdf_paths():
+    """Phase 2: set pdf_path on existing records, on a fresh connection"""
+    # Batches are committed separately so no single transaction locks the table.
+    # Paths are computed here and applied with one UPDATE ... FROM (VALUES ...)
+    # per batch, so the database does no per-row regex work.
+    select_sql = text("""
+        SELECT id, file_path, file_type FROM attachments
+        WHERE pdf_path IS NULL
+          AND file_type IN ('png', 'jpg', 'jpeg', 'gif', 'bmp', 'pdf')
+          AND id > :last_id
+        ORDER BY id
+        LIMIT :batch_size
+        FOR UPDATE SKIP LOCKED
+    """)
+    with engine.connect() as connection:
+        try:
+            total_updated = 0
+            last_id = 0
+            while True:
+                rows = connection.execute(
+                    select_sql, {"last_id": last_id, "batch_size": BACKFILL_BATCH_SIZE}
+                ).all()
+                if not rows:
+                    connection.commit()
+                    break
+                
+                values = [(row.id, pdf_path_for(row.file_path, row.file_type)) for row in rows]
+                with connection.connection.cursor() as cursor:
+                    execute_values(
+                        cursor,
+                        "UPDATE attachments SET pdf_path = v.pdf_path "
+                        "FROM (VALUES %s) AS v(id, pdf_path) WHERE attachments.id = v.id",
+                        values,
+                        page_size=len(values)
+                    )
+                connection.commit()
                 
-            # Update existing records to set pdf_path based on file_path
-            update_sql = text("""
-                UPDATE attachments
-                SET pdf_path = 
-                    CASE 
-                        WHEN file_type IN ('png', 'jpg', 'jpeg', 'gif', 'bmp')
-                        THEN REGEXP_REPLACE(file_path, '\.[^.]+$', '_label.pdf')
-                        WHEN file_type = 'pdf'
-                        THEN file_path
-                        ELSE NULL
-                    END
-                WHERE pdf_path IS NULL;
-            """)
-            connection.execute(update_sql)
-            connection.commit()
+                last_id = rows[-1].id
+                total_updated += len(rows)
+                print(f"   Updated {total_updated} record(s) so far...")
             print("✅ Successfully updated existing records")
-            
-            print("✅ Migration completed successfully!")
-            
         except Exception as e:
-            print(f"❌ Error during migration: {str(e)}")
+            # Earlier batches are committed; a rerun picks up from the rows still NULL
+            print(f"❌ Error backfilling pdf_path (after {total_updated} records): {str(e)}")
             connection.rollback()
             raise
 
+def run_migration():
+    print("🔄 Starting migration: Adding pdf_path column to attachments table...")
+    add_column()
+    backfill_pdf_paths()
+    print("✅ Migration completed successfully!")
+
 if __name__ == "__main__":
     run_migration()
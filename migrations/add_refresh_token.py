@@ -1,18 +1,12 @@
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
-from app.core.config import settings
+from sqlalchemy import text
+from app.db.session import SessionLocal
+from migrations._schema_cache import get_columns
 
 if __name__ == "__main__":
-    DATABASE_URL = settings.SQLALCHEMY_DATABASE_URI
-    engine = create_engine(DATABASE_URL)
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
     with SessionLocal() as db:
         try:
             # Check if refresh_token column exists
-            from sqlalchemy.inspect import inspect
-            inspector = inspect(engine)
-            columns = [c['name'] for c in inspector.get_columns('users')]
+            columns = get_columns('users')
             
             if 'refresh_token' not in columns:
                 print("Adding refresh_token column to users table...")
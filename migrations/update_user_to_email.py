@@ -1,18 +1,34 @@
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
-from app.core.config import settings
+from sqlalchemy import text
+from app.db.session import engine, SessionLocal
+from migrations._schema_cache import get_columns
 
-if __name__ == "__main__":
-    DATABASE_URL = settings.SQLALCHEMY_DATABASE_URI
-    engine = create_engine(DATABASE_URL)
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Users copied from username to email per committed UPDATE
+MIGRATE_BATCH_SIZE = 10000
+
+def create_email_index():
+    """Build ix_users_email without blocking writes to users (CONCURRENTLY cannot run in a transaction)"""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        # A failed concurrent build leaves an INVALID index that IF NOT EXISTS would skip
+        invalid = conn.execute(text("""
+            SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = 'ix_users_email' AND NOT i.indisvalid
+        """)).first()
+        if invalid:
+            print("Dropping invalid ix_users_email index left by an earlier run...")
+            conn.execute(text("DROP INDEX CONCURRENTLY IF EXISTS ix_users_email"))
+        
+        try:
+            conn.execute(text("CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ix_users_email ON users (email)"))
+        except Exception:
+            # Don't leave a half-built index behind (e.g. duplicate emails)
+            conn.execute(text("DROP INDEX CONCURRENTLY IF EXISTS ix_users_email"))
+            raise
 
+if __name__ == "__main__":
     with SessionLocal() as db:
         try:
             # Check if email column exists
-            from sqlalchemy.inspect import inspect
-            inspector = inspect(engine)
-            columns = [c['name'] for c in inspector.get_columns('users')]
+            columns = get_columns('users')
             
             if 'email' not in columns:
                 print("Adding email column to users table...")
@@ -24,24 +40,35 @@ if __name__ == "__main__":
             
             # Check if username column exists and if we need to migrate data
             if 'username' in columns:
-                print("Checking for existing users to migrate...")
-                result = db.execute(text("SELECT COUNT(*) FROM users WHERE username IS NOT NULL AND email IS NULL"))
-                count = result.scalar()
-                
-                if count > 0:
-                    print(f"Found {count} users to migrate from username to email...")
-                    # For now, we'll copy username to email (in production, you'd want to handle this differently)
-                    db.execute(text("UPDATE users SET email = username WHERE email IS NULL AND username IS NOT NULL"))
+                print("Migrating usernames to email...")
+                # For now, we'll copy username to email (in production, you'd want to handle this differently)
+                # Copied in committed batches so no single transaction locks every user row
+                migrate_sql = text("""
+                    UPDATE users SET email = username
+                    WHERE id IN (
+                        SELECT id FROM users
+                        WHERE email IS NULL AND username IS NOT NULL
+                        LIMIT :batch_size
+                    )
+                """)
+                migrated = 0
+                while True:
+                    updated = db.execute(migrate_sql, {"batch_size": MIGRATE_BATCH_SIZE}).rowcount
                     db.commit()
-                    print("✅ Migrated username data to email column")
+                    if not updated:
+                        break
+                    migrated += updated
+                
+                if migrated:
+                    print(f"✅ Migrated {migrated} users from username to email")
                 else:
                     print("No users found to migrate")
             
             # Make email column unique and not null
             print("Making email column unique and not null...")
             db.execute(text("ALTER TABLE users ALTER COLUMN email SET NOT NULL"))
-            db.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ix_users_email ON users (email)"))
             db.commit()
+            create_email_index()
             print("✅ Email column is now unique and not null")
             
             # Optionally drop username column (uncomment if you want to remove it)
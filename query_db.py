@@ -1,41 +1,57 @@
+import sys
 from app.db.session import SessionLocal
 from app.models.order import Order, Attachment, PrintJob
-from sqlalchemy.orm import joinedload
+from sqlalchemy import func
+from sqlalchemy.orm import selectinload
+
+# Orders loaded (with their attachments and print jobs) per batch
+ORDER_BATCH_SIZE = 500
 
 def query_orders():
     db = SessionLocal()
     try:
-        # Get all orders with their related data
+        # Stream orders in batches; each batch loads its attachments and print
+        # jobs with one IN query per relationship instead of a joined product
         orders = db.query(Order).options(
-            joinedload(Order.attachments),
-            joinedload(Order.print_jobs)
-        ).all()
+            selectinload(Order.attachments),
+            selectinload(Order.print_jobs)
+        ).yield_per(ORDER_BATCH_SIZE)
         
-        print(f"Found {len(orders)} orders:")
-        print("-" * 50)
+        # Lines are collected and written once per batch instead of print()ing each one
+        lines = [f"Found {db.query(func.count(Order.id)).scalar()} orders:", "-" * 50]
         
-        for order in orders:
-            print(f"Order ID: {order.id}")
-            print(f"PO Number: {order.po_number}")
-            print(f"Order Type: {order.order_type}")
-            print(f"Customer: {order.customer_name}")
-            print(f"Delivery Address: {order.delivery_address}")
-            print(f"Shipping Date: {order.committed_shipping_date}")
-            print(f"Status: {order.status}")
-            print(f"Processed: {order.processed_time}")
-            print(f"Folder: {order.folder_path}")
+        for count, order in enumerate(orders, 1):
+            lines += [
+                f"Order ID: {order.id}",
+                f"PO Number: {order.po_number}",
+                f"Order Type: {order.order_type}",
+                f"Customer: {order.customer_name}",
+                f"Delivery Address: {order.delivery_address}",
+                f"Shipping Date: {order.committed_shipping_date}",
+                f"Status: {order.status}",
+                f"Processed: {order.processed_time}",
+                f"Folder: {order.folder_path}",
+            ]
             
             if order.attachments:
-                print(f"Attachments ({len(order.attachments)}):")
-                for att in order.attachments:
-                    print(f"  - {att.file_name} ({att.file_type})")
+                lines.append(f"Attachments ({len(order.attachments)}):")
+                lines += [f"  - {att.file_name} ({att.file_type})" for att in order.attachments]
             
             if order.print_jobs:
-                print(f"Print Jobs ({len(order.print_jobs)}):")
-                for job in order.print_jobs:
-                    print(f"  - {job.job_type}: {job.total_print_length} inches, {job.gang_sheets} sheets")
+                lines.append(f"Print Jobs ({len(order.print_jobs)}):")
+                lines += [
+                    f"  - {job.job_type}: {job.total_print_length} inches, {job.gang_sheets} sheets"
+                    for job in order.print_jobs
+                ]
+            
+            lines.append("-" * 50)
             
-            print("-" * 50)
+            if count % ORDER_BATCH_SIZE == 0:
+                sys.stdout.write("\n".join(lines) + "\n")
+                lines = []
+        
+        if lines:
+            sys.stdout.write("\n".join(lines) + "\n")
             
     finally:
         db.close()
@@ -1,22 +1,24 @@
 """
 Script to run all database migrations
 """
-import importlib
-import os
+from migrations import add_pdf_path, add_order_cascade_deletes, add_order_indexes, add_email_config_notify
+
+# Migrations to run, in order
+MIGRATIONS = [
+    add_pdf_path,
+    add_order_cascade_deletes,
+    add_order_indexes,
+    add_email_config_notify,
+]
 
 def run_migrations():
     print("🔄 Running database migrations...")
     
-    # List of migrations to run in order
-    migrations = [
-        'add_pdf_path'
-    ]
-    
-    for migration in migrations:
+    for module in MIGRATIONS:
+        migration = module.__name__.rsplit('.', 1)[-1]
         try:
             print(f"\n📦 Running migration: {migration}")
-            migration_module = importlib.import_module(f"migrations.{migration}")
-            migration_module.run_migration()
+            module.run_migration()
         except Exception as e:
             print(f"❌ Error running migration {migration}: {str(e)}")
             raise
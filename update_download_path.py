@@ -7,6 +7,24 @@ import subprocess
 import sys
 from pathlib import Path
 
+# DOWNLOAD_PATH is already in os.environ, which the child process inherits
+RESTART_BACKEND_COMMAND = ['docker-compose', 'up', '-d', '--force-recreate', '--no-deps', 'backend']
+
+def write_env_file(env_content: str, env_path: str = '.env') -> bool:
+    """Atomically replace env_path with env_content; returns False if it already matched"""
+    env_file = Path(env_path)
+    try:
+        if env_file.read_text() == env_content:
+            return False
+    except FileNotFoundError:
+        pass
+    
+    # Write a sibling temp file and rename it over .env, so nothing ever sees a half-written file
+    tmp_file = env_file.with_name(env_file.name + '.tmp')
+    tmp_file.write_text(env_content)
+    os.replace(tmp_file, env_file)
+    return True
+
 def update_download_path(new_path: str):
     """Update the download path and restart Docker containers"""
     
@@ -18,22 +36,18 @@ def update_download_path(new_path: str):
     # Create a .env file with the new path
     env_content = f"DOWNLOAD_PATH={new_path}\n"
     
-    with open('.env', 'w') as f:
-        f.write(env_content)
-    
-    print(f"✅ Created .env file with DOWNLOAD_PATH={new_path}")
+    if write_env_file(env_content):
+        print(f"✅ Created .env file with DOWNLOAD_PATH={new_path}")
+    else:
+        print(f"ℹ️ .env file already has DOWNLOAD_PATH={new_path}")
     
     # Restart Docker containers
     print("🔄 Restarting Docker containers...")
     
     try:
-        # Stop containers
-        subprocess.run(['docker-compose', 'down'], check=True)
-        print("✅ Stopped containers")
-        
-        # Start containers with new environment
-        subprocess.run(['docker-compose', 'up', '-d'], check=True)
-        print("✅ Started containers with new download path")
+        # Recreate only the backend in place; db, frontend and the network are left running
+        subprocess.run(RESTART_BACKEND_COMMAND, check=True)
+        print("✅ Recreated backend container with new download path")
         
         print(f"\n🎉 Download path updated successfully!")
         print(f"📁 Files will now be saved to: {new_path}")
@@ -44,26 +58,30 @@ def update_download_path(new_path: str):
     
     return True
 
-def main():
-    if len(sys.argv) != 2:
-        print("Usage: python update_download_path.py <path>")
-        print("Example: python update_download_path.py C:/downloads")
-        sys.exit(1)
+def main(argv=None):
+    """Command-line entry point shared with simple_path_update.py; returns the exit code"""
+    argv = sys.argv if argv is None else argv
+    script = os.path.basename(argv[0]) if argv else "update_download_path.py"
+    args = [arg for arg in argv[1:] if arg != '--no-create']
+    create = len(args) == len(argv[1:])
+    
+    if len(args) != 1:
+        print(f"Usage: python {script} <path> [--no-create]")
+        print(f"Example: python {script} C:/downloads")
+        print(f"Example: python {script} C:/Users/YourName/Downloads")
+        return 1
     
-    new_path = sys.argv[1]
+    new_path = args[0]
     
-    if not os.path.exists(new_path):
-        print(f"⚠️ Path does not exist: {new_path}")
-        create = input("Do you want to create it? (y/n): ")
-        if create.lower() == 'y':
-            os.makedirs(new_path, exist_ok=True)
-            print(f"✅ Created directory: {new_path}")
-        else:
-            print("❌ Aborted")
-            sys.exit(1)
+    # One mkdir call instead of stat-then-mkdir (slow on network shares)
+    if create:
+        os.makedirs(new_path, exist_ok=True)
+    elif not os.path.isdir(new_path):
+        print(f"❌ Path does not exist: {new_path} (run without --no-create to create it)")
+        return 1
     
     success = update_download_path(new_path)
-    sys.exit(0 if success else 1)
+    return 0 if success else 1
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())